@@ -10,15 +10,59 @@ import sys
 import math
 import numpy as np
 import string
-import matplotlib.pyplot as plt
 import heapq as hq
+from collections import OrderedDict
 
 WORLD_SIZE = 26
+NUM_PROBLEMS = 100
+# cities sit on distinct points of a 100 x 100 map
+MAX_WORLD_SIZE = 100 * 100
 
 WORLD = [[] for x in range(WORLD_SIZE)]
 DISTANCES = np.zeros((WORLD_SIZE, WORLD_SIZE))
 EDGES = np.zeros((WORLD_SIZE, WORLD_SIZE))
-LABELS = dict(zip(range(0,26), string.ascii_uppercase))
+LABELS = dict(zip(range(WORLD_SIZE), string.ascii_uppercase))
+
+# bumped whenever the edges change; cached paths from an older world are discarded
+WORLD_VERSION = 0
+
+# LRU cache of (algorithm, start, destination) -> (path, path cost, (nodes added, nodes visited))
+PATH_CACHE_SIZE = 1024
+PATH_CACHE = OrderedDict()
+PATH_CACHE_VERSION = 0
+# city -> keys of cached A-star paths through it, whose optimal subpaths answer other A-star queries
+OPTIMAL_PATHS = {}
+
+
+def city_label(city):
+	"""
+	city_label()
+
+	@params - city: city number
+
+	@returns - letter naming the city, followed by a round number once the alphabet runs out (A..Z, A1..Z1, A2..).
+	"""
+	return string.ascii_uppercase[city % 26] + (str(city // 26) if city >= 26 else '')
+
+
+def configure_world(size):
+	"""
+	configure_world()
+
+	@params - size: number of cities (at least 2)
+
+	resize the world: empty city locations, distances and edges, and a label for every city.
+	"""
+	if size < 2 or size > MAX_WORLD_SIZE:
+		raise ValueError("world size must be between 2 and " + str(MAX_WORLD_SIZE))
+
+	global WORLD_SIZE, WORLD, DISTANCES, EDGES, LABELS, WORLD_VERSION
+	WORLD_SIZE = size
+	WORLD_VERSION += 1
+	WORLD = [[] for x in range(WORLD_SIZE)]
+	DISTANCES = np.zeros((WORLD_SIZE, WORLD_SIZE))
+	EDGES = np.zeros((WORLD_SIZE, WORLD_SIZE))
+	LABELS = dict((city, city_label(city)) for city in range(WORLD_SIZE))
 
 
 def generate_city_locations():
@@ -62,8 +106,9 @@ def generate_edges():
 	randomly choose between 1 and 4 of each cities closest neighbours and create an edge between them, with the euclidean distance between the cities as the path cost.
 	"""
 	# zero the list of edges for new rounds
-	global EDGES
+	global EDGES, WORLD_VERSION
 	EDGES = np.zeros((WORLD_SIZE, WORLD_SIZE))
+	WORLD_VERSION += 1
 
 	total_edges = 0.0
 
@@ -290,21 +335,81 @@ def compute_path_cost(path):
 
 	@params - path: path to have cost evaluated
 
-	return the total cost of a path from start to end
+	return the total cost of a path from start to end, leaving the path untouched
 	"""
 
 	if not path:
 		return None
 
-	current_node = path.pop(0)
-	total_cost = 0
+	path = np.asarray(path)
+	return EDGES[path[:-1], path[1:]].sum()
+
+
+SEARCHES = {'bfs': breadth_first_search,
+			'dfs': depth_first_search,
+			'iddfs': iterative_deepening_search,
+			'gbfs': greedy_best_first_search,
+			'as': a_star_search}
+
+
+def optimal_subpath(start_node, destination_node):
+	"""
+	optimal_subpath()
+
+	@params - start_node, destination_node
+
+	return a cached (path, cost, stats) entry for the part of a cached A-star path between start_node and destination_node, or None.
+	every part of an optimal path is itself optimal, and edges are symmetric so it can be walked either way.
+	no search is run, so the stats are (0, 0).
+	"""
+	for key in OPTIMAL_PATHS.get(start_node, set()) & OPTIMAL_PATHS.get(destination_node, set()):
+		path = PATH_CACHE[key][0]
+		start_index = path.index(start_node)
+		destination_index = path.index(destination_node)
+		if start_index <= destination_index:
+			subpath = path[start_index:destination_index + 1]
+		else:
+			subpath = path[destination_index:start_index + 1][::-1]
+		return subpath, compute_path_cost(subpath), (0, 0)
+	return None
+
+
+def cached_search(algorithm, start_node, destination_node):
+	"""
+	cached_search()
+
+	@params - algorithm: key of SEARCHES, start_node, destination_node
 
-	while path:
-		next_node = path.pop(0)
-		total_cost += EDGES[current_node][next_node]
-		current_node = next_node
+	return (path, path cost, (nodes added, nodes visited)) for the search, reusing results computed on the current world.
+	"""
+	global PATH_CACHE_VERSION
+	if PATH_CACHE_VERSION != WORLD_VERSION:
+		PATH_CACHE.clear()
+		OPTIMAL_PATHS.clear()
+		PATH_CACHE_VERSION = WORLD_VERSION
+
+	key = (algorithm, start_node, destination_node)
+	result = PATH_CACHE.pop(key, None)
+
+	if result is None and algorithm == 'as':
+		result = optimal_subpath(start_node, destination_node)
+
+	if result is None:
+		path, total_nodes_added, total_nodes_visited = SEARCHES[algorithm](start_node, destination_node)
+		result = (path, compute_path_cost(path), (total_nodes_added, total_nodes_visited))
+		if algorithm == 'as':
+			for city in path:
+				OPTIMAL_PATHS.setdefault(city, set()).add(key)
 
-	return total_cost
+	PATH_CACHE[key] = result
+	while len(PATH_CACHE) > PATH_CACHE_SIZE:
+		evicted_key, evicted = PATH_CACHE.popitem(last=False)
+		for city in evicted[0]:
+			OPTIMAL_PATHS.get(city, set()).discard(evicted_key)
+
+	# hand out a copy so callers cannot change the cached path
+	path, cost, stats = result
+	return path[:], cost, stats
 
 
 def setup():
@@ -320,6 +425,176 @@ def setup():
 	generate_edges()
 
 
+def single_search_main():
+	"""
+	single_search_main()
+
+	@params - none
+
+	solve one random problem in the current world with every algorithm and print the paths found.
+	"""
+	start_node = random.randint(0, WORLD_SIZE - 1)
+	destination_node = random.randint(0, WORLD_SIZE - 1)
+
+	while destination_node == start_node:
+		destination_node = random.randint(0, WORLD_SIZE - 1)
+
+	BFS = cached_search('bfs', start_node, destination_node)[0]
+	DFS = cached_search('dfs', start_node, destination_node)[0]
+	IDDFS = cached_search('iddfs', start_node, destination_node)[0] if BFS is not None else None
+	GBFS = cached_search('gbfs', start_node, destination_node)[0]
+	AS = cached_search('as', start_node, destination_node)[0]
+
+	print "Start node: " + LABELS[start_node] + "\nDestination Node: " + LABELS[destination_node]
+	print "Optimal-length Path (BFS, no path cost):", [LABELS[x] for x in BFS] if BFS else None, "\n\tpath cost:", compute_path_cost(BFS)
+	print "Possible non-optimal Path (DFS, no path cost):", [LABELS[x] for x in DFS] if DFS else None, "\n\tpath cost:", compute_path_cost(DFS)
+	print "Optimal-length Path (ID-DFS, no path cost):", [LABELS[x] for x in IDDFS] if IDDFS else None, "\n\tpath cost:", compute_path_cost(IDDFS)
+	print "Possible non-optimal Path (GBFS, path cost used):", [LABELS[x] for x in GBFS] if GBFS else None, "\n\tpath cost:", compute_path_cost(GBFS)
+	print "Optimal Path (A Star, path cost used):", [LABELS[x] for x in AS] if AS else None, "\n\tpath cost:", compute_path_cost(AS)
+
+
+def many_search_main(num_problems = NUM_PROBLEMS):
+	"""
+	many_search_main()
+
+	@params - num_problems: number of random problems, each on freshly generated edges
+
+	print the average space and time complexity, running time and path length of every algorithm.
+	"""
+	average_space_complexity_bfs = 0
+	average_space_complexity_dfs = 0
+	average_space_complexity_iddfs = 0
+	average_space_complexity_gbfs = 0
+	average_space_complexity_as = 0
+
+	average_time_complexity_bfs = 0
+	average_time_complexity_dfs = 0
+	average_time_complexity_iddfs = 0
+	average_time_complexity_gbfs = 0
+	average_time_complexity_as = 0
+
+	average_running_time_bfs = 0.0
+	average_running_time_dfs = 0.0
+	average_running_time_iddfs = 0.0
+	average_running_time_gbfs = 0.0
+	average_running_time_as = 0.0
+
+	average_path_length_bfs = 0
+	average_path_length_dfs = 0
+	average_path_length_iddfs = 0
+	average_path_length_gbfs = 0
+	average_path_length_as = 0
+
+	number_of_problems_solved_bfs = 0
+	number_of_problems_solved_dfs = 0
+	number_of_problems_solved_iddfs = 0
+	number_of_problems_solved_gbfs = 0
+	number_of_problems_solved_as = 0
+
+
+	for x in range(0, num_problems):
+		generate_edges()
+		start_node = random.randint(0, WORLD_SIZE - 1)
+		destination_node = random.randint(0, WORLD_SIZE - 1)
+
+		while destination_node == start_node:
+			destination_node = random.randint(0, WORLD_SIZE - 1)
+
+		BFS, bfs_cost, (bfs_added, bfs_visited) = cached_search('bfs', start_node, destination_node)
+		average_space_complexity_bfs += bfs_added
+		average_time_complexity_bfs += bfs_visited
+		average_path_length_bfs += len(BFS)
+		if BFS:
+			number_of_problems_solved_bfs += 1
+
+		DFS, dfs_cost, (dfs_added, dfs_visited) = cached_search('dfs', start_node, destination_node)
+		average_space_complexity_dfs += dfs_added
+		average_time_complexity_dfs += dfs_visited
+		average_path_length_dfs += len(DFS)
+		if DFS:
+			number_of_problems_solved_dfs += 1
+
+		IDDFS, iddfs_cost, (iddfs_added, iddfs_visited) = cached_search('iddfs', start_node, destination_node)
+		average_space_complexity_iddfs += iddfs_added
+		average_time_complexity_iddfs += iddfs_visited
+		average_path_length_iddfs += len(IDDFS)
+		if IDDFS:
+			number_of_problems_solved_iddfs += 1
+
+		GBFS, gbfs_cost, (gbfs_added, gbfs_visited) = cached_search('gbfs', start_node, destination_node)
+		average_space_complexity_gbfs += gbfs_added
+		average_time_complexity_gbfs += gbfs_visited
+		average_path_length_gbfs += len(GBFS)
+		if GBFS:
+			number_of_problems_solved_gbfs += 1
+
+		AS, as_cost, (as_added, as_visited) = cached_search('as', start_node, destination_node)
+		average_space_complexity_as += as_added
+		average_time_complexity_as += as_visited
+		average_path_length_as += len(AS)
+		if AS:
+			number_of_problems_solved_as += 1
+
+	average_space_complexity_bfs = average_space_complexity_bfs / num_problems
+	average_space_complexity_dfs = average_space_complexity_dfs / num_problems
+	average_space_complexity_iddfs = average_space_complexity_iddfs / num_problems
+	average_space_complexity_gbfs = average_space_complexity_gbfs / num_problems
+	average_space_complexity_as = average_space_complexity_as / num_problems
+
+	average_time_complexity_bfs = average_time_complexity_bfs / num_problems
+	average_time_complexity_dfs = average_time_complexity_dfs / num_problems
+	average_time_complexity_iddfs = average_time_complexity_iddfs / num_problems
+	average_time_complexity_gbfs = average_time_complexity_gbfs / num_problems
+	average_time_complexity_as = average_time_complexity_as / num_problems
+
+	average_running_time_bfs = average_running_time_bfs / num_problems
+	average_running_time_dfs = average_running_time_dfs / num_problems
+	average_running_time_iddfs = average_running_time_iddfs / num_problems
+	average_running_time_gbfs = average_running_time_gbfs / num_problems
+	average_running_time_as = average_running_time_as / num_problems
+
+	average_path_length_bfs = average_path_length_bfs / num_problems
+	average_path_length_dfs = average_path_length_dfs / num_problems
+	average_path_length_iddfs = average_path_length_iddfs / num_problems
+	average_path_length_gbfs = average_path_length_gbfs / num_problems
+	average_path_length_as = average_path_length_as / num_problems
+
+	print "*** BFS ***"
+	print "average space complexity:", average_space_complexity_bfs
+	print "average time complexity:", average_time_complexity_bfs
+	print "average running time:", average_running_time_bfs
+	print "average path length:", average_path_length_bfs
+	print "number of problems solved:", number_of_problems_solved_bfs, "\n"
+
+	print "*** DFS ***"
+	print "average space complexity:", average_space_complexity_dfs
+	print "average time complexity:", average_time_complexity_dfs
+	print "average running time:", average_running_time_dfs
+	print "average path length:", average_path_length_dfs
+	print "number of problems solved:", number_of_problems_solved_dfs, "\n"
+
+	print "*** IDDFS ***"
+	print "average space complexity:", average_space_complexity_iddfs
+	print "average time complexity:", average_time_complexity_iddfs
+	print "average running time:", average_running_time_iddfs
+	print "average path length:", average_path_length_iddfs
+	print "number of problems solved:", number_of_problems_solved_iddfs, "\n"
+
+	print "*** GBFS ***"
+	print "average space complexity:", average_space_complexity_gbfs
+	print "average time complexity:", average_time_complexity_gbfs
+	print "average running time:", average_running_time_gbfs
+	print "average path length:", average_path_length_gbfs
+	print "number of problems solved:", number_of_problems_solved_gbfs, "\n"
+
+	print "*** AS ***"
+	print "average space complexity:", average_space_complexity_as
+	print "average time complexity:", average_time_complexity_as
+	print "average running time:", average_running_time_as
+	print "average path length:", average_path_length_as
+	print "number of problems solved:", number_of_problems_solved_as, "\n"
+
+
 def main():
 
 	if len(sys.argv) == 1:
@@ -328,163 +603,13 @@ def main():
 
 	setup()
 
-	start_node = random.randint(0, 25)
-	destination_node = random.randint(0, 25)
-
-	while destination_node == start_node:
-		destination_node = random.randint(0, 25)
-	
 	if sys.argv[1] == "1":
-
-		BFS = breadth_first_search(start_node, destination_node)[0]
-		DFS = depth_first_search(start_node, destination_node)[0]
-		IDDFS = iterative_deepening_search(start_node, destination_node)[0] if BFS is not None else None
-		GBFS = greedy_best_first_search(start_node, destination_node)[0]
-		AS = a_star_search(start_node, destination_node)[0]
-
-		print "Start node: " + LABELS[start_node] + "\nDestination Node: " + LABELS[destination_node]
-		print "Optimal-length Path (BFS, no path cost):", [LABELS[x] for x in BFS] if BFS else None, "\n\tpath cost:", compute_path_cost(BFS)
-		print "Possible non-optimal Path (DFS, no path cost):", [LABELS[x] for x in DFS] if DFS else None, "\n\tpath cost:", compute_path_cost(DFS)
-		print "Optimal-length Path (ID-DFS, no path cost):", [LABELS[x] for x in IDDFS] if IDDFS else None, "\n\tpath cost:", compute_path_cost(IDDFS)
-		print "Possible non-optimal Path (GBFS, path cost used):", [LABELS[x] for x in GBFS] if GBFS else None, "\n\tpath cost:", compute_path_cost(GBFS)
-		print "Optimal Path (A Star, path cost used):", [LABELS[x] for x in AS] if AS else None, "\n\tpath cost:", compute_path_cost(AS)
-	
+		single_search_main()
 	elif sys.argv[1] == "many":
-		average_space_complexity_bfs = 0
-		average_space_complexity_dfs = 0
-		average_space_complexity_iddfs = 0
-		average_space_complexity_gbfs = 0
-		average_space_complexity_as = 0
-
-		average_time_complexity_bfs = 0
-		average_time_complexity_dfs = 0
-		average_time_complexity_iddfs = 0
-		average_time_complexity_gbfs = 0
-		average_time_complexity_as = 0
-
-		average_running_time_bfs = 0.0
-		average_running_time_dfs = 0.0
-		average_running_time_iddfs = 0.0
-		average_running_time_gbfs = 0.0
-		average_running_time_as = 0.0
-
-		average_path_length_bfs = 0
-		average_path_length_dfs = 0
-		average_path_length_iddfs = 0
-		average_path_length_gbfs = 0
-		average_path_length_as = 0
-
-		number_of_problems_solved_bfs = 0
-		number_of_problems_solved_dfs = 0
-		number_of_problems_solved_iddfs = 0
-		number_of_problems_solved_gbfs = 0
-		number_of_problems_solved_as = 0
-
-
-		for x in range(0, 100):
-			generate_edges()
-			start_node = random.randint(0, 25)
-			destination_node = random.randint(0, 25)
-
-			while destination_node == start_node:
-				destination_node = random.randint(0, 25)
-
-			BFS, bfs_added, bfs_visited = breadth_first_search(start_node, destination_node)
-			average_space_complexity_bfs += bfs_added
-			average_time_complexity_bfs += bfs_visited
-			average_path_length_bfs += len(BFS)
-			if BFS:
-				number_of_problems_solved_bfs += 1
-
-			DFS, dfs_added, dfs_visited = depth_first_search(start_node, destination_node)
-			average_space_complexity_dfs += dfs_added
-			average_time_complexity_dfs += dfs_visited
-			average_path_length_dfs += len(DFS)
-			if DFS:
-				number_of_problems_solved_dfs += 1
-
-			IDDFS, iddfs_added, iddfs_visited = iterative_deepening_search(start_node, destination_node)
-			average_space_complexity_iddfs += iddfs_added
-			average_time_complexity_iddfs += iddfs_visited
-			average_path_length_iddfs += len(IDDFS)
-			if IDDFS:
-				number_of_problems_solved_iddfs += 1
-
-			GBFS, gbfs_added, gbfs_visited = greedy_best_first_search(start_node, destination_node)
-			average_space_complexity_gbfs += gbfs_added
-			average_time_complexity_gbfs += gbfs_visited
-			average_path_length_gbfs += len(GBFS)
-			if GBFS:
-				number_of_problems_solved_gbfs += 1
-
-			AS, as_added, as_visited = a_star_search(start_node, destination_node)
-			average_space_complexity_as += as_added
-			average_time_complexity_as += as_visited
-			average_path_length_as += len(AS)
-			if AS:
-				number_of_problems_solved_as += 1
-
-		average_space_complexity_bfs = average_space_complexity_bfs / 100
-		average_space_complexity_dfs = average_space_complexity_dfs / 100
-		average_space_complexity_iddfs = average_space_complexity_iddfs / 100
-		average_space_complexity_gbfs = average_space_complexity_gbfs / 100
-		average_space_complexity_as = average_space_complexity_as / 100
-
-		average_time_complexity_bfs = average_time_complexity_bfs / 100
-		average_time_complexity_dfs = average_time_complexity_dfs / 100
-		average_time_complexity_iddfs = average_time_complexity_iddfs / 100
-		average_time_complexity_gbfs = average_time_complexity_gbfs / 100
-		average_time_complexity_as = average_time_complexity_as / 100
-
-		average_running_time_bfs = average_running_time_bfs / 100
-		average_running_time_dfs = average_running_time_dfs / 100
-		average_running_time_iddfs = average_running_time_iddfs / 100
-		average_running_time_gbfs = average_running_time_gbfs / 100
-		average_running_time_as = average_running_time_as / 100
-
-		average_path_length_bfs = average_path_length_bfs / 100
-		average_path_length_dfs = average_path_length_dfs / 100
-		average_path_length_iddfs = average_path_length_iddfs / 100
-		average_path_length_gbfs = average_path_length_gbfs / 100
-		average_path_length_as = average_path_length_as / 100
-
-		print "*** BFS ***"
-		print "average space complexity:", average_space_complexity_bfs
-		print "average time complexity:", average_time_complexity_bfs
-		print "average running time:", average_running_time_bfs
-		print "average path length:", average_path_length_bfs
-		print "number of problems solved:", number_of_problems_solved_bfs, "\n"
-
-		print "*** DFS ***"
-		print "average space complexity:", average_space_complexity_dfs
-		print "average time complexity:", average_time_complexity_dfs
-		print "average running time:", average_running_time_dfs
-		print "average path length:", average_path_length_dfs
-		print "number of problems solved:", number_of_problems_solved_dfs, "\n"
-
-		print "*** IDDFS ***"
-		print "average space complexity:", average_space_complexity_iddfs
-		print "average time complexity:", average_time_complexity_iddfs
-		print "average running time:", average_running_time_iddfs
-		print "average path length:", average_path_length_iddfs
-		print "number of problems solved:", number_of_problems_solved_iddfs, "\n"
-
-		print "*** GBFS ***"
-		print "average space complexity:", average_space_complexity_gbfs
-		print "average time complexity:", average_time_complexity_gbfs
-		print "average running time:", average_running_time_gbfs
-		print "average path length:", average_path_length_gbfs
-		print "number of problems solved:", number_of_problems_solved_gbfs, "\n"
-
-		print "*** AS ***"
-		print "average space complexity:", average_space_complexity_as
-		print "average time complexity:", average_time_complexity_as
-		print "average running time:", average_running_time_as
-		print "average path length:", average_path_length_as
-		print "number of problems solved:", number_of_problems_solved_as, "\n"
-
+		many_search_main()
 
 	# display the city locations on a plot
+	# import matplotlib.pyplot as plt
 	# plt.plot([x[0] for x in WORLD], [y[1] for y in WORLD], 'ro')
 	# plt.axis([0, 99, 0, 99])
 	# plt.show()
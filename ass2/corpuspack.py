@@ -0,0 +1,233 @@
+# corpuspack.py
+#
+# Pack a review corpus directory into a single data file plus an offset/label index,
+# and read reviews back from either layout.
+#
+# A corpus directory holds one subdirectory per class ('pos', 'neg') with one review
+# per file. A pack is '<name>' holding every review back to back, and '<name>.idx'
+# holding a header followed by one (offset, length, label) record per review.
+#
+# usage: corpuspack.py <corpus_directory> <pack_file>
+
+import os, sys, mmap, struct
+from os.path import isdir, isfile, join
+
+LABELS = {'neg': 0, 'pos': 1}
+
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = b'RPAK'
+INDEX_HEADER = struct.Struct('<4sIQ')     # magic, version, number of reviews
+INDEX_RECORD = struct.Struct('<QQB')      # offset, length, label
+INDEX_VERSION = 1
+
+
+def is_pack(path):
+    """
+    is_pack()
+
+    @params - path: corpus directory or pack file
+
+    @returns - True if path is a pack file with an index next to it.
+    """
+    return isfile(path) and isfile(path + INDEX_SUFFIX)
+
+
+def corpus_files(directory):
+    """
+    corpus_files()
+
+    @params - directory: corpus directory
+
+    @returns - list of (label, filename) for every review, in sorted order.
+    raises IOError if directory does not exist, ValueError if it has no class subdirectory.
+    """
+    if not isdir(directory):
+        raise IOError("not a review pack or corpus directory: " + directory)
+    if not any(isdir(join(directory, class_name)) for class_name in LABELS):
+        raise ValueError("corpus directory has no " + " or ".join(sorted(LABELS)) + " subdirectory: " + directory)
+
+    files = []
+    for class_name in sorted(LABELS):
+        class_directory = join(directory, class_name)
+        if not isdir(class_directory):
+            continue
+        for filename in sorted(os.listdir(class_directory)):
+            files.append((LABELS[class_name], join(class_directory, filename)))
+    return files
+
+
+def read_files(files):
+    """
+    read_files()
+
+    @params - files: list of (label, filename)
+
+    @returns - generator of (label, content), skipping directories.
+    """
+    for label, filename in files:
+        # skip directories
+        if not isfile(filename):
+            continue
+        file = open(filename, 'rb')
+        content = file.read()
+        file.close()
+        yield label, content
+
+
+def write_pack(documents, pack_file):
+    """
+    write_pack()
+
+    @params - documents: iterable of (label, content), pack_file: data file to write (the index is written to pack_file + '.idx')
+
+    @returns - number of reviews packed.
+    """
+    data = open(pack_file, 'wb')
+    records = []
+    offset = 0
+
+    for label, content in documents:
+        data.write(content)
+        records.append(INDEX_RECORD.pack(offset, len(content), label))
+        offset += len(content)
+
+    data.close()
+
+    index = open(pack_file + INDEX_SUFFIX, 'wb')
+    index.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(records)))
+    index.write(b''.join(records))
+    index.close()
+
+    return len(records)
+
+
+def pack_corpus(directory, pack_file):
+    """
+    pack_corpus()
+
+    @params - directory: corpus directory, pack_file: data file to write (the index is written to pack_file + '.idx')
+
+    @returns - number of reviews packed.
+    """
+    return write_pack(read_files(corpus_files(directory)), pack_file)
+
+
+def read_index(pack_file):
+    """
+    read_index()
+
+    @params - pack_file: pack data file
+
+    @returns - list of (offset, length, label) records.
+    """
+    index = open(pack_file + INDEX_SUFFIX, 'rb')
+    content = index.read()
+    index.close()
+
+    magic, version, num_records = INDEX_HEADER.unpack_from(content, 0)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        raise ValueError("not a review pack index: " + pack_file + INDEX_SUFFIX)
+
+    return [INDEX_RECORD.unpack_from(content, INDEX_HEADER.size + x * INDEX_RECORD.size) for x in range(num_records)]
+
+
+def map_pack(pack_file):
+    """
+    map_pack()
+
+    @params - pack_file: pack data file
+
+    @returns - read-only memory map of the whole data file.
+    """
+    data = open(pack_file, 'rb')
+    try:
+        # mmap refuses empty files
+        if os.fstat(data.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        data.close()
+
+
+def slice_view(mapping, offset, length):
+    """
+    slice_view()
+
+    @params - mapping: memory map of a pack, offset/length: position of a review
+
+    @returns - zero-copy view of the review's bytes.
+    """
+    try:
+        return memoryview(mapping)[offset:offset + length]
+    except TypeError:
+        # Python 2 mmap objects only support the old buffer interface
+        return buffer(mapping, offset, length)
+
+
+def read_pack(pack_file):
+    """
+    read_pack()
+
+    @params - pack_file: pack data file
+
+    @returns - generator of (label, view) for every review, where view is a zero-copy slice of the mapped file.
+    """
+    mapping = map_pack(pack_file)
+    for offset, length, label in read_index(pack_file):
+        yield label, slice_view(mapping, offset, length)
+
+
+def load_corpus(path):
+    """
+    load_corpus()
+
+    @params - path: corpus directory or pack file
+
+    @returns - (positive reviews, negative reviews), each a list of filenames (directory) or views (pack).
+    readable with document_content().
+    """
+    if is_pack(path):
+        documents = read_pack(path)
+    else:
+        documents = corpus_files(path)
+
+    positive_reviews = []
+    negative_reviews = []
+    for label, document in documents:
+        if label == LABELS['pos']:
+            positive_reviews.append(document)
+        else:
+            negative_reviews.append(document)
+    return positive_reviews, negative_reviews
+
+
+def document_content(document):
+    """
+    document_content()
+
+    @params - document: filename or view from load_corpus()
+
+    @returns - text of the review, or None if document names a directory.
+    """
+    if isinstance(document, str):
+        # skip directories
+        if not isfile(document):
+            return None
+        file = open(document, 'r')
+        content = file.read()
+        file.close()
+        return content
+    return bytes(document)
+
+
+def main():
+
+    if len(sys.argv) < 3:
+        print "Please specify a corpus directory and a pack file."
+        exit(1)
+
+    num_reviews = pack_corpus(sys.argv[1], sys.argv[2])
+    print "packed", num_reviews, "reviews into", sys.argv[2]
+
+if __name__ == '__main__':
+    main()
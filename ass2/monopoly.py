@@ -3,12 +3,25 @@
 # simulate a reduced game of monopoly for the purposes of probabilistic modelling
 #
 # Author: Anthony Shackell - June 8, 2018
+#
+# Many games are played side by side, each with one or more players sharing a
+# shuffled chance deck. The whole simulation lives in numpy arrays (one row per
+# game), so a turn is a handful of array operations over every game at once, and
+# the state can be checkpointed to disk and resumed to refine the estimates.
+#
+# usage: monopoly.py [checkpoint_file]
+#        (an existing checkpoint is resumed and played for NUM_TURNS more turns)
 
-import math, random, operator
+import os, sys, pickle, tempfile, numpy
 
 NUM_TURNS = 100
 NUM_SIMULATIONS = 1000
+NUM_PLAYERS = 1
 BOARD_SIZE = 40
+JAIL_SPACE = 10
+# turns between checkpoints when a checkpoint file is given
+CHECKPOINT_INTERVAL = 10
+CHECKPOINT_VERSION = 1
 # 6 chance cards deal with money, which we don't care about and thus are represented
 # as (None, 0) in the 'deck'
 CHANCE_CARDS = [(None, 0),
@@ -29,132 +42,270 @@ CHANCE_CARDS = [(None, 0),
                 ('Get Out of Jail Free', None)] # GoJ Free
 CHANCE_SPACES = [7, 22, 36]
 
-def roll_dice():
+JAIL_CARD = CHANCE_CARDS.index(('Move Directly', [JAIL_SPACE]))
+GOJ_FREE_CARD = CHANCE_CARDS.index(('Get Out of Jail Free', None))
+NO_HOLDER = -1
+
+
+def chance_moves():
     """
-    roll_dice()
+    chance_moves()
 
-    simulate a roll of two dice.
+    tabulate where every chance card sends a player from every space.
 
     @params - None
 
-    @returns - sum of the two dice, boolean of whether to roll again or not.
+    @returns - (cards x spaces) array of destination spaces, -1 where the card does not move the player.
     """
-    roll_again = False
+    moves = numpy.full((len(CHANCE_CARDS), BOARD_SIZE), -1, dtype=numpy.intp)
+    for card in range(len(CHANCE_CARDS)):
+        action, spaces = CHANCE_CARDS[card]
+        for space in range(BOARD_SIZE):
+            if action == 'Go Back':
+                moves[card, space] = (space - spaces[0]) % BOARD_SIZE
+            elif action == 'Advance':
+                # advance to nearest element from list of spaces to move
+                destination = space
+                while destination not in spaces:
+                    destination = (destination + 1) % BOARD_SIZE
+                moves[card, space] = destination
+            elif action == 'Move Directly':
+                moves[card, space] = spaces[0]
+    return moves
 
-    # di rolls are independent events
-    di_1 = random.randint(1, 6)
-    di_2 = random.randint(1, 6)
+CHANCE_MOVES = chance_moves()
+IS_CHANCE_SPACE = numpy.in1d(numpy.arange(BOARD_SIZE), CHANCE_SPACES)
 
-    # if we roll doubles we get to roll again in the same turn
-    if di_1 == di_2:
-        roll_again = True
 
-    return di_1 + di_2, roll_again
+def new_state(num_games = NUM_SIMULATIONS, num_players = NUM_PLAYERS, seed = None):
+    """
+    new_state()
 
+    start num_games games of num_players players, everyone on GO, each game with its own shuffled chance deck.
 
-def select_chance_card():
+    @params - num_games: number of games played side by side, num_players: players per game, seed: random seed
+
+    @returns - simulation state dictionary of numpy arrays (one row per game) plus the turn count and random state.
     """
-    select_chance_card()
+    random_state = numpy.random.RandomState(seed)
+    return {'version': CHECKPOINT_VERSION,
+            'turns': 0,
+            'positions': numpy.zeros((num_games, num_players), dtype=numpy.int8),
+            'in_jail': numpy.zeros((num_games, num_players), dtype=bool),
+            # player holding the Get Out of Jail Free card, which is out of the deck meanwhile
+            'goj_holder': numpy.full(num_games, NO_HOLDER, dtype=numpy.int8),
+            'counts': numpy.zeros((num_games, num_players, BOARD_SIZE), dtype=numpy.int32),
+            'movements': numpy.zeros((num_games, num_players), dtype=numpy.int32),
+            'decks': numpy.argsort(random_state.rand(num_games, len(CHANCE_CARDS)), axis=1).astype(numpy.int8),
+            'next_card': numpy.zeros(num_games, dtype=numpy.int8),
+            'random_state': random_state}
 
-    select a chance card at random from the available deck.
 
-    @params - None
+def draw_chance_cards(state, games):
+    """
+    draw_chance_cards()
+
+    draw the top chance card of each game's deck; drawn cards go back to the bottom,
+    and a held Get Out of Jail Free card is skipped because it is not in the deck.
+
+    @params - state: simulation state, games: indexes of the games drawing a card
+
+    @returns - array of card indexes into CHANCE_CARDS.
+    """
+    decks = state['decks']
+    next_card = state['next_card']
+
+    cards = decks[games, next_card[games]]
+    next_card[games] = (next_card[games] + 1) % len(CHANCE_CARDS)
+
+    held = (cards == GOJ_FREE_CARD) & (state['goj_holder'][games] != NO_HOLDER)
+    skipped = games[held]
+    cards[held] = decks[skipped, next_card[skipped]]
+    next_card[skipped] = (next_card[skipped] + 1) % len(CHANCE_CARDS)
+    return cards
+
+
+def move(state, games, player, spaces, movement = True):
+    """
+    move()
+
+    put player on spaces in games and count the landing.
 
-    @returns - number indicating the chance card picked from the deck.
+    @params - state: simulation state, games: game indexes, player: player number, spaces: new space per game,
+    movement: whether the landing counts as a movement
+
+    @returns - None
     """
-    chance_card_index = random.randint(0,15)
-    return CHANCE_CARDS[chance_card_index]
+    state['positions'][games, player] = spaces
+    state['counts'][games, player, spaces] += 1
+    if movement:
+        state['movements'][games, player] += 1
+
+
+def play_turn(state, player):
+    """
+    play_turn()
+
+    play one turn of player in every game.
+
+    @params - state: simulation state, player: player number
+
+    @returns - None
+    """
+    positions = state['positions']
+    in_jail = state['in_jail']
+    num_games = len(positions)
+
+    # up to three rolls of two dice per game
+    dice = state['random_state'].randint(1, 7, (num_games, 3, 2))
+    rolls = dice.sum(axis=2)
+    doubles = dice[:, :, 0] == dice[:, :, 1]
+
+    # simulate being 'in jail'. normally we'd have to pay money to get out of jail after three
+    # non-double rolls, but here we just leave after three consecutive non-double rolls, or one double roll.
+    jailed = numpy.flatnonzero(in_jail[:, player])
+    if len(jailed):
+        last_roll = numpy.where(doubles[jailed].any(axis=1), doubles[jailed].argmax(axis=1), 2)
+        # every non-double roll after the first counts as another turn spent in jail
+        extra_turns = last_roll - (doubles[jailed, last_roll] & (last_roll > 0))
+        state['counts'][jailed, player, positions[jailed, player]] += extra_turns
+        move(state, jailed, player, (positions[jailed, player] + rolls[jailed, last_roll]) % BOARD_SIZE, movement=False)
+        in_jail[jailed, player] = False
+
+    active = ~numpy.in1d(numpy.arange(num_games), jailed)
+    games = numpy.flatnonzero(active)
+    move(state, games, player, (positions[games, player] + rolls[games, 0]) % BOARD_SIZE)
+
+    games = games[IS_CHANCE_SPACE[positions[games, player]]]
+    if len(games):
+        cards = draw_chance_cards(state, games)
+
+        destinations = CHANCE_MOVES[cards, positions[games, player]]
+        moved = destinations >= 0
+        move(state, games[moved], player, destinations[moved])
+
+        # go directly to jail, unless the player holds the Get Out of Jail Free card (which goes back in the deck);
+        # either way the turn ends
+        sent = games[cards == JAIL_CARD]
+        freed = sent[state['goj_holder'][sent] == player]
+        state['goj_holder'][freed] = NO_HOLDER
+        in_jail[numpy.setdiff1d(sent, freed), player] = True
+        active[sent] = False
+
+        state['goj_holder'][games[cards == GOJ_FREE_CARD]] = player
+
+    # doubles roll again; the third double in a row goes to jail for speeding
+    rolling = active & doubles[:, 0]
+    for roll in [1, 2]:
+        games = numpy.flatnonzero(rolling)
+        spaces = (positions[games, player] + rolls[games, roll]) % BOARD_SIZE
+        if roll == 2:
+            speeding = doubles[games, roll]
+            spaces[speeding] = JAIL_SPACE
+            in_jail[games[speeding], player] = True
+        move(state, games, player, spaces)
+        rolling &= doubles[:, roll]
+
+
+def save_state(state, checkpoint):
+    """
+    save_state()
+
+    write the simulation state to checkpoint, replacing any earlier checkpoint only once the new one is complete.
+
+    @params - state: simulation state, checkpoint: checkpoint file
+
+    @returns - None
+    """
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(checkpoint)), suffix='.tmp')
+    file = os.fdopen(descriptor, 'wb')
+    try:
+        pickle.dump(state, file, pickle.HIGHEST_PROTOCOL)
+        file.close()
+        os.rename(temporary, checkpoint)
+    except:
+        file.close()
+        os.remove(temporary)
+        raise
+
+
+def load_state(checkpoint):
+    """
+    load_state()
+
+    @params - checkpoint: checkpoint file written by save_state()
+
+    @returns - simulation state, ready to keep playing.
+    """
+    file = open(checkpoint, 'rb')
+    state = pickle.load(file)
+    file.close()
+
+    if not isinstance(state, dict) or state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError("not a monopoly checkpoint: " + checkpoint)
+    return state
+
+
+def play(state, num_turns = NUM_TURNS, checkpoint = None, checkpoint_interval = CHECKPOINT_INTERVAL):
+    """
+    play()
+
+    play num_turns more turns of every game, each player in turn.
+
+    @params - state: simulation state, num_turns: turns to play, checkpoint: optional checkpoint file,
+    checkpoint_interval: turns between checkpoints
+
+    @returns - None
+    """
+    num_players = state['positions'].shape[1]
+    for turn in range(num_turns):
+        for player in range(num_players):
+            play_turn(state, player)
+        state['turns'] += 1
+
+        if checkpoint and (turn + 1) % checkpoint_interval == 0:
+            save_state(state, checkpoint)
+
+    if checkpoint:
+        save_state(state, checkpoint)
+
+
+def probabilities(state):
+    """
+    probabilities()
+
+    @params - state: simulation state
+
+    @returns - probability of landing on each space: landings per movement of each player, averaged over every player of every game.
+    """
+    movements = numpy.maximum(state['movements'], 1)[:, :, None]
+    return (state['counts'] / movements.astype(numpy.float64)).mean(axis=(0, 1))
+
+
+def simulate(num_simulations = NUM_SIMULATIONS, num_turns = NUM_TURNS, num_players = NUM_PLAYERS, checkpoint = None, seed = None):
+    """
+    simulate()
+
+    play num_simulations games of num_turns turns each, or resume the games in checkpoint for num_turns more turns.
+
+    @params - num_simulations: number of games, num_turns: turns per game, num_players: players per game,
+    checkpoint: optional checkpoint file, resumed if it exists, seed: random seed of new games
+
+    @returns - probability of landing on each space, averaged over the games.
+    """
+    if checkpoint and os.path.exists(checkpoint):
+        state = load_state(checkpoint)
+        print "resuming", state['positions'].shape[0], "games of", state['positions'].shape[1], "players after", state['turns'], "turns"
+    else:
+        state = new_state(num_simulations, num_players, seed)
+
+    play(state, num_turns, checkpoint)
+    return probabilities(state)
 
 
 def main():
 
-    global_probability_matrix = [0.0 for x in range(BOARD_SIZE)]
-
-    for simulation in range(NUM_SIMULATIONS):
-
-        simulation_probability_matrix = [0.0 for x in range(BOARD_SIZE)]
-        current_space = 0
-        goj_free = False
-        in_jail = False
-        num_movements = 0
-
-        for turn in range(NUM_TURNS):
-            # simulate being 'in jail'
-            if in_jail:
-                roll, roll_again = roll_dice()
-                num_jail_rolls = 1
-
-                # normally we'd have to pay money to get out of jail after three
-                # non-double rolls, but here we just leave after three consecutive
-                # non-double rolls, or one double roll.
-                while not roll_again and num_jail_rolls < 3:
-                    roll, roll_again = roll_dice()
-                    # if we roll doubles
-                    if roll_again:
-                        break
-                    num_jail_rolls += 1
-                    simulation_probability_matrix[current_space] += 1.0
-
-                current_space = (current_space + roll) % BOARD_SIZE
-                simulation_probability_matrix[current_space] += 1.0
-                in_jail = False
-                continue
-
-            roll, roll_again = roll_dice()
-            num_rolls = 1
-            current_space = (current_space + roll) % BOARD_SIZE
-            num_movements += 1
-            simulation_probability_matrix[current_space] += 1.0
-
-            if current_space in CHANCE_SPACES:
-                chance_card = select_chance_card()
-                if chance_card[0] == None:
-                    pass
-                elif chance_card[0] == 'Go Back':
-                    current_space = current_space - chance_card[1][0]
-                    # Python's mod operator misbehaves with negative numbers
-                    # always renturns a positive member of the same congruence class
-                    if current_space < 0:
-                        current_space += 40
-                    num_movements += 1
-                    simulation_probability_matrix[current_space] += 1.0
-                elif chance_card[0] == 'Advance':
-                    # advance to nearest element from list of spaces to move
-                    # not the most elegant solution, but it works.
-                    while current_space not in chance_card[1]:
-                        current_space = (current_space + 1) % BOARD_SIZE
-                    num_movements += 1
-                    simulation_probability_matrix[current_space] += 1.0
-                elif chance_card[0] == 'Move Directly':
-                    current_space = chance_card[1][0]
-                    num_movements += 1
-                    simulation_probability_matrix[current_space] += 1.0
-                    # allow room for expansion with other 'Move Directly' cards
-                    if chance_card[1][0] == 10 and not goj_free:
-                        in_jail = True
-                        continue
-                    elif chance_card[1][0] == 10 and goj_free:
-                        goj_free = False
-                        continue
-                elif chance_card[0] == 'Get Out of Jail Free':
-                    goj_free = True
-
-            while roll_again and num_rolls < 3:
-                roll, roll_again = roll_dice()
-                num_rolls += 1
-                # go to jail for speeding if we roll three doubles in a row
-                if num_rolls == 3 and roll_again:
-                    current_space = 10
-                    in_jail = True
-                else:
-                    current_space = (current_space + roll) % BOARD_SIZE
-                simulation_probability_matrix[current_space] += 1.0
-                num_movements += 1
-
-        simulation_probability_matrix[:] = [x / num_movements for x in simulation_probability_matrix]
-        global_probability_matrix = list(map(operator.add, global_probability_matrix, simulation_probability_matrix))
-
-    global_probability_matrix = [x / NUM_SIMULATIONS for x in global_probability_matrix]
+    global_probability_matrix = simulate(checkpoint=sys.argv[1] if len(sys.argv) > 1 else None)
     # print average probabilities.
     for x in range(BOARD_SIZE):
         print 'Space', x, 'probability:', '%.5f'%global_probability_matrix[x]
@@ -4,14 +4,22 @@
 # each dictionary word given the review polarity
 #
 # Author: Anthony Shackell - June 8, 2018
+#
+# usage: reviews.py [corpus]
+#        reviews.py save <model_file> [corpus]    (model for ../ass3/classify.py)
 
-import os, operator, random
-from os.path import isfile, join
+import sys, operator, random
+from os.path import abspath, dirname, join
+import corpuspack, tokenizer
 
 SEARCH_WORDS = ['awful', 'bad', 'boring', 'dull', 'effective', 'enjoyable', 'great', 'hilarious']
+VOCABULARY = tokenizer.build_vocabulary(SEARCH_WORDS)
+# reused by every call to tokenizer.encode()
+TOKEN_IDS = tokenizer.new_id_buffer()
 
-POSITIVE_REVIEW_DIRECTORY = '/Users/ashackell/git/CSC421/ass2/review_polarity/txt_sentoken/pos'
-NEGATIVE_REVIEW_DIRECTORY = '/Users/ashackell/git/CSC421/ass2/review_polarity/txt_sentoken/neg'
+# corpus directory (with 'pos' and 'neg' subdirectories) or a pack built by corpuspack.py
+REVIEW_CORPUS = join(dirname(abspath(__file__)), 'review_polarity', 'txt_sentoken')
+NUM_FOLDS = 10
 
 num_pos_files = 0
 num_neg_files = 0
@@ -26,37 +34,33 @@ def bernoulli_classifier(feature_vector, class_probability):
 
 def build_probabilities(pos_file_list = [], neg_file_list = [], probability_vector_positive = [], probability_vector_negative = []):
 
-    global num_pos_files, num_neg_files, POSITIVE_REVIEW_DIRECTORY, NEGATIVE_REVIEW_DIRECTORY, SEARCH_WORDS
+    global num_pos_files, num_neg_files, SEARCH_WORDS
 
     # read positive reviews
-    for filename in pos_file_list:
+    for document in pos_file_list:
         local_probability_vector_positive = [0.0 for x in range(8)]
+        content = corpuspack.document_content(document)
         # skip directories
-        if not isfile(filename):
+        if content is None:
             continue
-        file = open(filename, 'r')
-        content = file.read()
-        for word in content.split():
-            if word.lower() in SEARCH_WORDS:
-                local_probability_vector_positive[SEARCH_WORDS.index(word)] = 1
+        num_ids = tokenizer.encode(content, VOCABULARY, TOKEN_IDS)
+        for x in range(num_ids):
+            local_probability_vector_positive[TOKEN_IDS[x]] = 1
         num_pos_files += 1
-        file.close()
         probability_vector_positive[:] = list(map(operator.add, probability_vector_positive, local_probability_vector_positive))
 
 
     # read negative reviews
-    for filename in neg_file_list:
+    for document in neg_file_list:
         local_probability_vector_negative = [0.0 for x in range(8)]
+        content = corpuspack.document_content(document)
         # skip directories
-        if not isfile(filename):
+        if content is None:
             continue
-        file = open(filename, 'r')
-        content = file.read()
-        for word in content.split():
-            if word.lower() in SEARCH_WORDS:
-                local_probability_vector_negative[SEARCH_WORDS.index(word)] = 1
+        num_ids = tokenizer.encode(content, VOCABULARY, TOKEN_IDS)
+        for x in range(num_ids):
+            local_probability_vector_negative[TOKEN_IDS[x]] = 1
         num_neg_files += 1
-        file.close()
         probability_vector_negative[:] = list(map(operator.add, probability_vector_negative, local_probability_vector_negative))
 
 
@@ -66,7 +70,7 @@ def build_probabilities(pos_file_list = [], neg_file_list = [], probability_vect
 
 def validate(pos_file_list = [], neg_file_list = [], probability_vector_positive = [], probability_vector_negative = []):
 
-    global POSITIVE_REVIEW_DIRECTORY, NEGATIVE_REVIEW_DIRECTORY, SEARCH_WORDS
+    global SEARCH_WORDS
     feature_vector = [0.0 for x in range(8)]
 
     positive_decisions_pos = 0
@@ -74,44 +78,38 @@ def validate(pos_file_list = [], neg_file_list = [], probability_vector_positive
     positive_decisions_neg = 0
     negative_decisions_neg = 0
 
-    for filename in pos_file_list:
+    for document in pos_file_list:
         feature_vector = [0.0 for x in range(8)]
+        content = corpuspack.document_content(document)
         # skip directories
-        if not isfile(filename):
+        if content is None:
             continue
-        file = open(filename, 'r')
-        content = file.read()
-        for word in content.split():
-            if word.lower() in SEARCH_WORDS:
-                feature_vector[SEARCH_WORDS.index(word)] = 1
+        num_ids = tokenizer.encode(content, VOCABULARY, TOKEN_IDS)
+        for x in range(num_ids):
+            feature_vector[TOKEN_IDS[x]] = 1
 
         prob_neg = bernoulli_classifier(feature_vector, probability_vector_negative)
         prob_pos = bernoulli_classifier(feature_vector, probability_vector_positive)
 
-        file.close()
-
         if prob_neg > prob_pos:
             negative_decisions_pos += 1
         else:
             positive_decisions_pos += 1
 
 
-    for filename in neg_file_list:
+    for document in neg_file_list:
         feature_vector = [0.0 for x in range(8)]
+        content = corpuspack.document_content(document)
         # skip directories
-        if not isfile(filename):
+        if content is None:
             continue
-        file = open(filename, 'r')
-        content = file.read()
-        for word in content.split():
-            if word.lower() in SEARCH_WORDS:
-                feature_vector[SEARCH_WORDS.index(word)] = 1
+        num_ids = tokenizer.encode(content, VOCABULARY, TOKEN_IDS)
+        for x in range(num_ids):
+            feature_vector[TOKEN_IDS[x]] = 1
 
         prob_neg = bernoulli_classifier(feature_vector, probability_vector_negative)
         prob_pos = bernoulli_classifier(feature_vector, probability_vector_positive)
 
-        file.close()
-
         if prob_neg > prob_pos:
             negative_decisions_neg += 1
         else:
@@ -129,10 +127,15 @@ def generate_random_review(probability_vector):
     print words_included
 
 
-def main():
+def validation_main(corpus = REVIEW_CORPUS, num_folds = NUM_FOLDS):
+    """
+    validation_main()
+
+    @params - corpus: corpus directory or pack file, num_folds: number of folds for k-fold validation
 
-    positive_reviews = [ join(POSITIVE_REVIEW_DIRECTORY, filename) for filename in os.listdir(POSITIVE_REVIEW_DIRECTORY) ]
-    negative_reviews = [ join(NEGATIVE_REVIEW_DIRECTORY, filename) for filename in os.listdir(NEGATIVE_REVIEW_DIRECTORY) ]
+    print the word probabilities, whole-set and k-fold validation results, and a few generated reviews.
+    """
+    positive_reviews, negative_reviews = corpuspack.load_corpus(corpus)
 
     print "*** WHOLE-SET VALIDATION ***"
     print
@@ -155,7 +158,7 @@ def main():
 
     pos_pos, pos_neg, neg_neg, neg_pos = validate(positive_reviews, negative_reviews, whole_set_probability_vector_positive, whole_set_probability_vector_negative)
 
-    print "positive decisions from pos reviews:",  pos_pos/1000.0*100, "%\nnegative decisions from pos reviews:", pos_neg/1000.0*100, "%\npositive decisions from neg reviews:", neg_neg/1000.0*100, "%\nnegative decisions from neg reviews:", neg_pos/1000.0*100, "%"
+    print "positive decisions from pos reviews:",  pos_pos/float(len(positive_reviews))*100, "%\nnegative decisions from pos reviews:", pos_neg/float(len(positive_reviews))*100, "%\npositive decisions from neg reviews:", neg_neg/float(len(negative_reviews))*100, "%\nnegative decisions from neg reviews:", neg_pos/float(len(negative_reviews))*100, "%"
 
     print
 
@@ -166,31 +169,35 @@ def main():
     fold_results_neg_neg = []
     fold_results_neg_pos = []
 
-    for x in range(10):
+    fold_size_positive = len(positive_reviews) // num_folds
+    fold_size_negative = len(negative_reviews) // num_folds
+
+    for x in range(num_folds):
         k_fold_probability_vector_positive = [0.0 for x in range(8)]
         k_fold_probability_vector_negative = [0.0 for x in range(8)]
 
-        start_index = x*100
-        classification_files_positive = positive_reviews[start_index:(start_index+100)]
-        classification_files_negative = negative_reviews[start_index:(start_index+100)]
+        start_positive = x*fold_size_positive
+        start_negative = x*fold_size_negative
+        classification_files_positive = positive_reviews[start_positive:(start_positive+fold_size_positive)]
+        classification_files_negative = negative_reviews[start_negative:(start_negative+fold_size_negative)]
 
-        training_files_positive = [ filename for filename in positive_reviews if filename not in classification_files_positive ]
-        training_files_negative = [ filename for filename in negative_reviews if filename not in classification_files_negative ]
+        training_files_positive = positive_reviews[:start_positive] + positive_reviews[(start_positive+fold_size_positive):]
+        training_files_negative = negative_reviews[:start_negative] + negative_reviews[(start_negative+fold_size_negative):]
 
         build_probabilities(training_files_positive, training_files_negative, k_fold_probability_vector_positive, k_fold_probability_vector_negative)
 
         pos_pos, pos_neg, neg_neg, neg_pos = validate(classification_files_positive, classification_files_negative, k_fold_probability_vector_positive, k_fold_probability_vector_negative)
 
-        fold_results_pos_pos.append(pos_pos/100.0*100)
-        fold_results_pos_neg.append(pos_neg/100.0*100)
-        fold_results_neg_neg.append(neg_neg/100.0*100)
-        fold_results_neg_pos.append(neg_pos/100.0*100)
+        fold_results_pos_pos.append(pos_pos/float(fold_size_positive)*100)
+        fold_results_pos_neg.append(pos_neg/float(fold_size_positive)*100)
+        fold_results_neg_neg.append(neg_neg/float(fold_size_negative)*100)
+        fold_results_neg_pos.append(neg_pos/float(fold_size_negative)*100)
 
     # average results
-    average_pos_pos = sum(fold_results_pos_pos)/10.0
-    average_pos_neg = sum(fold_results_pos_neg)/10.0
-    average_neg_neg = sum(fold_results_neg_neg)/10.0
-    average_neg_pos = sum(fold_results_neg_pos)/10.0
+    average_pos_pos = sum(fold_results_pos_pos)/float(num_folds)
+    average_pos_neg = sum(fold_results_pos_neg)/float(num_folds)
+    average_neg_neg = sum(fold_results_neg_neg)/float(num_folds)
+    average_neg_pos = sum(fold_results_neg_pos)/float(num_folds)
 
     print "positive decisions from pos reviews:",  average_pos_pos, "%\nnegative decisions from pos reviews:", average_pos_neg, "%\npositive decisions from neg reviews:", average_neg_neg, "%\nnegative decisions from neg reviews:", average_neg_pos, "%"
 
@@ -204,5 +211,39 @@ def main():
     for x in range(5):
         generate_random_review(whole_set_probability_vector_negative)
 
+
+def save_main(args):
+    """
+    save_main()
+
+    @params - args: model_file [corpus]
+
+    build the word probabilities from the whole corpus and save them as a Bernoulli model for classify.py.
+    """
+    if not args:
+        print "Please specify a model file."
+        exit(1)
+
+    corpus = args[1] if len(args) > 1 else REVIEW_CORPUS
+    positive_reviews, negative_reviews = corpuspack.load_corpus(corpus)
+    probability_vector_positive = [0.0 for x in range(8)]
+    probability_vector_negative = [0.0 for x in range(8)]
+    build_probabilities(positive_reviews, negative_reviews, probability_vector_positive, probability_vector_negative)
+
+    # the model format lives with the classifiers in ass3
+    sys.path.insert(0, join(dirname(abspath(__file__)), '..', 'ass3'))
+    import nbmodel
+    nbmodel.save_model(args[0], nbmodel.model_from_probabilities(SEARCH_WORDS, probability_vector_positive, probability_vector_negative))
+
+    print "saved word probabilities of", len(positive_reviews) + len(negative_reviews), "reviews to", args[0]
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "save":
+        save_main(sys.argv[2:])
+        return
+
+    validation_main(sys.argv[1] if len(sys.argv) > 1 else REVIEW_CORPUS)
+
 if __name__ == '__main__':
     main()
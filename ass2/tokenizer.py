@@ -0,0 +1,203 @@
+# tokenizer.py
+#
+# Bytes-level tokenizer shared by the review classifiers.
+#
+# Reviews are lowercased and stripped of punctuation with a single translate() call,
+# split once, and mapped straight to integer ids of a vocabulary. Bigrams are looked
+# up as 'first second' keys of the same vocabulary.
+#
+# usage: tokenizer.py [corpus directory or pack file]
+
+import sys, time
+from array import array
+from itertools import chain
+from os.path import abspath, dirname, join
+
+import corpuspack
+
+BENCHMARK_CORPUS = join(dirname(abspath(__file__)), 'review_polarity', 'txt_sentoken')
+BENCHMARK_REPEATS = 3
+
+
+def build_translate_table():
+    """
+    build_translate_table()
+
+    @params - None
+
+    @returns - 256-byte table mapping A-Z to a-z and every other ASCII character
+    that is not a letter, digit or apostrophe to a space. Non-ASCII bytes are kept.
+    """
+    table = bytearray(range(256))
+    for code in range(128):
+        character = chr(code)
+        if 'A' <= character <= 'Z':
+            table[code] = code + 32
+        elif not (character.isalnum() or character == "'"):
+            table[code] = ord(' ')
+    return bytes(table)
+
+TRANSLATE_TABLE = build_translate_table()
+
+
+def normalize(content):
+    """
+    normalize()
+
+    @params - content: review bytes
+
+    @returns - list of lowercased tokens with punctuation removed.
+    """
+    return content.translate(TRANSLATE_TABLE).split()
+
+
+def build_vocabulary(words):
+    """
+    build_vocabulary()
+
+    @params - words: list of words and 'first second' bigrams
+
+    @returns - dictionary of normalized word -> id, ids numbered in the order given.
+    """
+    vocabulary = {}
+    for word in words:
+        key = b' '.join(normalize(word))
+        if key not in vocabulary:
+            vocabulary[key] = len(vocabulary)
+    return vocabulary
+
+
+def has_bigrams(vocabulary):
+    """
+    has_bigrams()
+
+    @params - vocabulary: dictionary from build_vocabulary()
+
+    @returns - True if any vocabulary entry is a bigram.
+    """
+    return any(b' ' in word for word in vocabulary)
+
+
+def new_id_buffer(size = 4096):
+    """
+    new_id_buffer()
+
+    @params - size: initial number of ids the buffer holds
+
+    @returns - integer array to be reused across encode() calls.
+    """
+    return array('i', [0]) * size
+
+
+def encode(content, vocabulary, ids, bigrams = False):
+    """
+    encode()
+
+    @params - content: review bytes, vocabulary: dictionary from build_vocabulary(), ids: buffer from new_id_buffer(), bigrams: also emit bigram ids
+
+    @returns - number of ids written to the front of ids (unigrams first, then bigrams).
+    out-of-vocabulary tokens are skipped; ids are written straight into the buffer, which doubles in place when full.
+    """
+    tokens = content.translate(TRANSLATE_TABLE).split()
+    lookup = vocabulary.get
+
+    token_ids = map(lookup, tokens)
+    if bigrams:
+        token_ids = chain(token_ids, map(lookup, map(b' '.join, zip(tokens, tokens[1:]))))
+
+    num_ids = 0
+    capacity = len(ids)
+    for token_id in token_ids:
+        if token_id is None:
+            continue
+        if num_ids == capacity:
+            ids.extend(array('i', [0]) * max(capacity, 1))
+            capacity = len(ids)
+        ids[num_ids] = token_id
+        num_ids += 1
+    return num_ids
+
+
+def count_ids(ids, num_ids, size):
+    """
+    count_ids()
+
+    @params - ids: buffer filled by encode(), num_ids: number of ids written, size: vocabulary size
+
+    @returns - list holding the number of occurrences of each id.
+    """
+    counts = [0.0 for x in range(size)]
+    for x in range(num_ids):
+        counts[ids[x]] += 1
+    return counts
+
+
+def split_lookup(contents, words):
+    """
+    split_lookup()
+
+    @params - contents: list of reviews, words: list of words
+
+    the original loaders' content.split()/word.lower() path, kept as the benchmark baseline.
+    """
+    for content in contents:
+        for word in content.split():
+            if word.lower() in words:
+                words.index(word.lower())
+
+
+def encode_all(contents, vocabulary, bigrams):
+    """
+    encode_all()
+
+    @params - contents: list of reviews, vocabulary: dictionary from build_vocabulary(), bigrams: also emit bigram ids
+
+    encode every review into one reused buffer.
+    """
+    ids = new_id_buffer()
+    for content in contents:
+        encode(content, vocabulary, ids, bigrams)
+
+
+def benchmark(contents, words, repeats = BENCHMARK_REPEATS):
+    """
+    benchmark()
+
+    @params - contents: list of reviews, words: vocabulary words, repeats: runs per method (best one is kept)
+
+    @returns - list of (method, tokens per second).
+    """
+    vocabulary = build_vocabulary(words)
+    # count tokens outside of the timed region so every method is charged for tokenizing only
+    num_tokens = sum(len(content.split()) for content in contents)
+    methods = [('split + lower', lambda: split_lookup(contents, words)),
+               ('encode unigrams', lambda: encode_all(contents, vocabulary, False)),
+               ('encode unigrams + bigrams', lambda: encode_all(contents, vocabulary, True))]
+
+    results = []
+    for name, method in methods:
+        best_time = None
+        for repeat in range(repeats):
+            start_time = time.time()
+            method()
+            elapsed = time.time() - start_time
+            if best_time is None or elapsed < best_time:
+                best_time = elapsed
+        results.append((name, num_tokens / max(best_time, 1e-9)))
+    return results
+
+
+def main():
+    corpus = sys.argv[1] if len(sys.argv) > 1 else BENCHMARK_CORPUS
+    positive_reviews, negative_reviews = corpuspack.load_corpus(corpus)
+    contents = [corpuspack.document_content(document) for document in positive_reviews + negative_reviews]
+    contents = [content for content in contents if content is not None]
+
+    words = ['awful', 'bad', 'boring', 'dull', 'effective', 'enjoyable', 'great', 'hilarious', 'not good', 'not bad']
+
+    print "reviews:", len(contents)
+    for name, tokens_per_second in benchmark(contents, words):
+        print name, ":", '%.0f'%tokens_per_second, "tokens/s"
+
+if __name__ == '__main__':
+    main()
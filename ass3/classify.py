@@ -0,0 +1,124 @@
+# classify.py
+#
+# Classify reviews with a model saved by 'naivebayes.py save' or 'reviews.py save'.
+#
+# Reviews are read one per line, from stdin or from clients of a local (unix) socket,
+# scored in micro-batches and answered one line per review: '<label>\t<log-odds>'.
+#
+# usage: classify.py <model_file> [socket_path]
+
+import os, sys, stat, select, socket
+import nbmodel
+
+BATCH_SIZE = 1000
+
+
+def classify_batch(lines, model):
+    """
+    classify_batch()
+
+    @params - lines: list of reviews, model: model dictionary
+
+    @returns - one output line per review.
+    """
+    labels, log_odds = nbmodel.classify(lines, model)
+    return ''.join('%d\t%.4f\n' % (labels[x], log_odds[x]) for x in range(len(lines)))
+
+
+def serve_stream(input_file, output_file, model, batch_size = BATCH_SIZE):
+    """
+    serve_stream()
+
+    @params - input_file: file of reviews, one per line, output_file: file to write results, model: model dictionary, batch_size: reviews per micro-batch
+
+    input is read straight from the file descriptor, whatever is available at the time, and its
+    complete lines are scored at once (in batches of at most batch_size), so a client writing one
+    review at a time gets each answer right away while bulk input is still scored in large batches.
+    """
+    descriptor = input_file.fileno()
+    pending = ''
+    while True:
+        chunk = os.read(descriptor, 1 << 16)
+        if not chunk:
+            break
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        for start in range(0, len(lines), batch_size):
+            output_file.write(classify_batch(lines[start:start + batch_size], model))
+        output_file.flush()
+
+    if pending:
+        output_file.write(classify_batch([pending], model))
+        output_file.flush()
+
+
+def serve_socket(socket_path, model):
+    """
+    serve_socket()
+
+    @params - socket_path: filesystem path of the unix socket to listen on (a stale socket there is replaced,
+    anything else is an IOError), model: model dictionary
+
+    clients are served side by side with select(), so an idle client never holds up the others; every chunk
+    received from a client is scored as one micro-batch of its complete lines.
+    """
+    if os.path.lexists(socket_path):
+        if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+            raise IOError("not a socket, refusing to replace it: " + socket_path)
+        os.remove(socket_path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(5)
+    # connection -> partial line received so far
+    pending = {}
+
+    try:
+        while True:
+            readable = select.select([server] + list(pending), [], [])[0]
+            for connection in readable:
+                if connection is server:
+                    pending[server.accept()[0]] = ''
+                    continue
+
+                try:
+                    chunk = connection.recv(1 << 16)
+                    if chunk:
+                        lines = (pending[connection] + chunk).split('\n')
+                        pending[connection] = lines.pop()
+                        if lines:
+                            connection.sendall(classify_batch(lines, model))
+                        continue
+                    if pending[connection]:
+                        connection.sendall(classify_batch([pending[connection]], model))
+                except socket.error:
+                    # a client that went away only loses its own answers
+                    pass
+                del pending[connection]
+                connection.close()
+    finally:
+        for connection in pending:
+            connection.close()
+        server.close()
+        os.remove(socket_path)
+
+
+def main():
+
+    if len(sys.argv) == 1:
+        print "Please specify a model file, and optionally a socket path."
+        exit(1)
+
+    model = nbmodel.load_model(sys.argv[1])
+
+    if len(sys.argv) > 2:
+        try:
+            serve_socket(sys.argv[2], model)
+        except IOError as error:
+            print error
+            exit(1)
+    else:
+        serve_stream(sys.stdin, sys.stdout, model)
+
+if __name__ == '__main__':
+    main()
@@ -3,36 +3,665 @@
 # Solve a cryptarithmetic puzzle in figure 6.2 of the AIMA textbook.
 #
 # Author: Anthony Shackell - June 15, 2018
+#
+# Puzzles are solved by a built-in CSP engine: domains are bitsets (bit v set when
+# value v is still possible), AllDifferent and column-sum constraints are revised from
+# an AC-3 style worklist, and search picks the variable with the minimum remaining
+# values (ties broken by degree) and yields solutions one at a time.
 
-from constraint import *
+import sys, time, multiprocessing
 import pprint
 
+ALLDIFF = 'alldiff'
+LINEAR = 'linear'
+
+# parallel solving modes
+ALL_SOLUTIONS = 'all'
+FIRST_SOLUTION = 'first'
+COUNT_SOLUTIONS = 'count'
+# variables assigned before the search tree is handed out as subtrees
+SPLIT_DEPTH = 2
+
+# problem attached by each parallel solving worker process
+WORKER_PROBLEM = {}
+
+
+def domain_values(domain):
+    """
+    domain_values()
+
+    @params - domain: bitset domain
+
+    @returns - list of the values in domain, smallest first.
+    """
+    values = []
+    while domain:
+        lowest = domain & -domain
+        values.append(lowest.bit_length() - 1)
+        domain ^= lowest
+    return values
+
+
+def domain_size(domain):
+    """
+    domain_size()
+
+    @params - domain: bitset domain
+
+    @returns - number of values in domain.
+    """
+    return bin(domain).count('1')
+
+
+def value_range(low, high):
+    """
+    value_range()
+
+    @params - low, high: inclusive bounds
+
+    @returns - bitset domain holding every value from low to high.
+    """
+    low = max(low, 0)
+    if high < low:
+        return 0
+    return ((1 << (high + 1)) - 1) ^ ((1 << low) - 1)
+
+
+def build_problem(variables, domains, constraints):
+    """
+    build_problem()
+
+    @params - variables: list of variable names, domains: list of bitset domains,
+    constraints: list of (ALLDIFF, variable indexes) or (LINEAR, variable indexes, coefficients, constant)
+
+    @returns - problem dictionary used by the solver.
+    """
+    watchers = [[] for variable in variables]
+    for index in range(len(constraints)):
+        for variable in constraints[index][1]:
+            watchers[variable].append(index)
+
+    return {'variables': list(variables),
+            'domains': list(domains),
+            'constraints': list(constraints),
+            'watchers': watchers}
+
+
+def revise_alldiff(constraint, domains):
+    """
+    revise_alldiff()
+
+    @params - constraint: (ALLDIFF, variable indexes), domains: list of bitset domains, updated in place
+
+    @returns - list of variables whose domain shrank, or None if the constraint cannot be satisfied.
+    """
+    variables = constraint[1]
+    changed = []
+
+    while True:
+        fixed = 0
+        for variable in variables:
+            domain = domains[variable]
+            # singleton domains claim their value
+            if not domain & (domain - 1):
+                if fixed & domain:
+                    return None
+                fixed |= domain
+
+        new_singleton = False
+        union = 0
+        for variable in variables:
+            domain = domains[variable]
+            if domain & (domain - 1):
+                reduced = domain & ~fixed
+                if not reduced:
+                    return None
+                if reduced != domain:
+                    domains[variable] = reduced
+                    changed.append(variable)
+                    if not reduced & (reduced - 1):
+                        new_singleton = True
+                domain = reduced
+            union |= domain
+
+        # pigeonhole: n variables need n distinct values between them
+        if domain_size(union) < len(variables):
+            return None
+        if not new_singleton:
+            return changed
+
+
+def revise_linear(constraint, domains):
+    """
+    revise_linear()
+
+    @params - constraint: (LINEAR, variable indexes, coefficients, constant) meaning sum(coefficient * variable) == constant,
+    domains: list of bitset domains, updated in place
+
+    @returns - list of variables whose domain shrank, or None if the constraint cannot be satisfied.
+
+    prunes every variable to the values its term can take given the bounds of the other terms.
+    """
+    variables, coefficients, constant = constraint[1], constraint[2], constraint[3]
+    changed = []
+    terms = range(len(variables))
+
+    while True:
+        lows = []
+        highs = []
+        for term in terms:
+            domain = domains[variables[term]]
+            low = (domain & -domain).bit_length() - 1
+            high = domain.bit_length() - 1
+            coefficient = coefficients[term]
+            if coefficient > 0:
+                lows.append(coefficient * low)
+                highs.append(coefficient * high)
+            else:
+                lows.append(coefficient * high)
+                highs.append(coefficient * low)
+        total_low = sum(lows)
+        total_high = sum(highs)
+
+        if not total_low <= constant <= total_high:
+            return None
+
+        narrowed = False
+        for term in terms:
+            # coefficient * value must lie in [least, most]
+            least = constant - (total_high - highs[term])
+            most = constant - (total_low - lows[term])
+            coefficient = coefficients[term]
+            if coefficient > 0:
+                allowed = value_range(-((-least) // coefficient), most // coefficient)
+            else:
+                allowed = value_range(-((-most) // coefficient), least // coefficient)
+
+            variable = variables[term]
+            domain = domains[variable]
+            reduced = domain & allowed
+            if not reduced:
+                return None
+            if reduced != domain:
+                domains[variable] = reduced
+                changed.append(variable)
+                narrowed = True
+
+        if not narrowed:
+            return changed
+
+REVISE = {ALLDIFF: revise_alldiff, LINEAR: revise_linear}
+
+
+def propagate(problem, domains, queue):
+    """
+    propagate()
+
+    @params - problem: problem dictionary, domains: list of bitset domains, updated in place, queue: constraint indexes to revise
+
+    @returns - False if some domain was wiped out, True once every constraint is consistent.
+    """
+    constraints = problem['constraints']
+    watchers = problem['watchers']
+    queue = list(queue)
+    queued = set(queue)
+
+    while queue:
+        index = queue.pop()
+        queued.discard(index)
+        constraint = constraints[index]
+        changed = REVISE[constraint[0]](constraint, domains)
+        if changed is None:
+            return False
+        for variable in changed:
+            for neighbour in watchers[variable]:
+                if neighbour != index and neighbour not in queued:
+                    queue.append(neighbour)
+                    queued.add(neighbour)
+    return True
+
+
+def select_variable(problem, domains):
+    """
+    select_variable()
+
+    @params - problem: problem dictionary, domains: list of bitset domains
+
+    @returns - unassigned variable with the fewest values left (most constraints on ties), or None if all are assigned.
+    """
+    watchers = problem['watchers']
+    best = None
+    best_key = None
+    for variable in range(len(domains)):
+        size = domain_size(domains[variable])
+        if size > 1:
+            key = (size, -len(watchers[variable]))
+            if best_key is None or key < best_key:
+                best = variable
+                best_key = key
+    return best
+
+
+def search(problem, domains):
+    """
+    search()
+
+    @params - problem: problem dictionary, domains: consistent bitset domains
+
+    @returns - generator of solutions below this node, as lists of values.
+    """
+    variable = select_variable(problem, domains)
+    if variable is None:
+        yield [domain.bit_length() - 1 for domain in domains]
+        return
+
+    for value in domain_values(domains[variable]):
+        child = domains[:]
+        child[variable] = 1 << value
+        if propagate(problem, child, problem['watchers'][variable]):
+            for solution in search(problem, child):
+                yield solution
+
+
+def solve(problem):
+    """
+    solve()
+
+    @params - problem: problem dictionary
+
+    @returns - generator of solutions, as dictionaries of variable name -> value.
+    """
+    domains = problem['domains'][:]
+    if not propagate(problem, domains, range(len(problem['constraints']))):
+        return
+
+    names = problem['variables']
+    for solution in search(problem, domains):
+        yield dict(zip(names, solution))
+
+
+def split_search(problem, domains, depth):
+    """
+    split_search()
+
+    @params - problem: problem dictionary, domains: consistent bitset domains, depth: number of variables to assign
+
+    @returns - generator of the consistent domains at the roots of the subtrees after assigning depth variables,
+    in the same variable order search() would use.
+    """
+    variable = select_variable(problem, domains)
+    if depth == 0 or variable is None:
+        yield domains
+        return
+
+    for value in domain_values(domains[variable]):
+        child = domains[:]
+        child[variable] = 1 << value
+        if propagate(problem, child, problem['watchers'][variable]):
+            for subtree in split_search(problem, child, depth - 1):
+                yield subtree
+
+
+def attach_problem(problem):
+    """
+    attach_problem()
+
+    @params - problem: problem dictionary
+
+    worker initializer: keep the problem so tasks only carry the domains of their subtree.
+    """
+    WORKER_PROBLEM['problem'] = problem
+
+
+def solve_subtree(task):
+    """
+    solve_subtree()
+
+    @params - task: (subtree root domains, mode)
+
+    @returns - list of solutions (value lists) of the subtree, at most one in FIRST_SOLUTION mode,
+    or the number of solutions in COUNT_SOLUTIONS mode.
+    """
+    domains, mode = task
+    solutions = search(WORKER_PROBLEM['problem'], domains)
+
+    if mode == COUNT_SOLUTIONS:
+        return sum(1 for solution in solutions)
+    if mode == FIRST_SOLUTION:
+        for solution in solutions:
+            return [solution]
+        return []
+    return list(solutions)
+
+
+def parallel_search(problem, mode, split_depth, processes):
+    """
+    parallel_search()
+
+    @params - problem: problem dictionary, mode: ALL_SOLUTIONS, FIRST_SOLUTION or COUNT_SOLUTIONS,
+    split_depth: variables assigned before splitting, processes: worker count (default: number of CPUs)
+
+    @returns - generator of subtree results, in completion order.
+
+    subtrees go through the pool one at a time, so a worker that finishes early takes the next
+    unclaimed subtree; the pool is stopped as soon as the consumer stops iterating.
+    """
+    domains = problem['domains'][:]
+    if not propagate(problem, domains, range(len(problem['constraints']))):
+        return
+
+    tasks = ((subtree, mode) for subtree in split_search(problem, domains, split_depth))
+    pool = multiprocessing.Pool(processes, attach_problem, (problem,))
+    try:
+        for result in pool.imap_unordered(solve_subtree, tasks):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def parallel_solve(problem, first_only = False, split_depth = SPLIT_DEPTH, processes = None):
+    """
+    parallel_solve()
+
+    @params - problem: problem dictionary, first_only: stop after the first solution,
+    split_depth: variables assigned before splitting, processes: worker count (default: number of CPUs)
+
+    @returns - generator of solutions, as dictionaries of variable name -> value, streamed as subtrees finish.
+    """
+    names = problem['variables']
+    mode = FIRST_SOLUTION if first_only else ALL_SOLUTIONS
+
+    for solutions in parallel_search(problem, mode, split_depth, processes):
+        for solution in solutions:
+            yield dict(zip(names, solution))
+            if first_only:
+                return
+
+
+def parallel_count(problem, split_depth = SPLIT_DEPTH, processes = None):
+    """
+    parallel_count()
+
+    @params - problem: problem dictionary, split_depth: variables assigned before splitting, processes: worker count
+
+    @returns - number of solutions, counted in the workers without sending any solution back.
+    """
+    return sum(parallel_search(problem, COUNT_SOLUTIONS, split_depth, processes))
+
+
+def word_puzzle(puzzle, leading_zeros = False):
+    """
+    word_puzzle()
+
+    @params - puzzle: sum such as 'SEND+MORE=MONEY' (any number of addends), leading_zeros: allow multi-letter words to start with 0
+
+    @returns - problem dictionary over the letters and generated carry variables C1, C2, ... (C1 is the carry out of the units column).
+    """
+    left, right = puzzle.replace(' ', '').upper().split('=')
+    addends = left.split('+')
+    result = right
+
+    letters = sorted(set(''.join(addends) + result))
+    variables = list(letters)
+    index = dict((letter, x) for x, letter in enumerate(letters))
+
+    leading = set(word[0] for word in addends + [result] if len(word) > 1)
+    domains = [value_range(1 if letter in leading and not leading_zeros else 0, 9) for letter in letters]
+    constraints = [(ALLDIFF, tuple(range(len(letters))))]
+
+    num_columns = max(len(result), max(len(word) for word in addends))
+    carry_in = None
+    carry_in_high = 0
+
+    for column in range(num_columns):
+        terms = {}
+        for word in addends:
+            if column < len(word):
+                letter = index[word[-1 - column]]
+                terms[letter] = terms.get(letter, 0) + 1
+        if column < len(result):
+            letter = index[result[-1 - column]]
+            terms[letter] = terms.get(letter, 0) - 1
+        if carry_in is not None:
+            terms[carry_in] = terms.get(carry_in, 0) + 1
+
+        # the last column has no carry out
+        carry_out = None
+        if column < num_columns - 1:
+            num_addends = len([word for word in addends if column < len(word)])
+            carry_in_high = (9 * num_addends + carry_in_high) // 10
+            carry_out = len(variables)
+            variables.append('C%d' % (column + 1))
+            domains.append(value_range(0, carry_in_high))
+            terms[carry_out] = -10
+
+        terms = [(variable, coefficient) for variable, coefficient in sorted(terms.items()) if coefficient]
+        constraints.append((LINEAR, tuple(term[0] for term in terms), tuple(term[1] for term in terms), 0))
+        carry_in = carry_out
+
+    return build_problem(variables, domains, constraints)
+
 
 def cryptarithmetic():
     """
     Solve the cryptarithmetic puzzle described in figure 6.2 of the AIMA text.
     @params - None
     """
-    problem = Problem()
     pp = pprint.PrettyPrinter(indent=2)
 
-    problem.addVariables(['T', 'W', 'O', 'F', 'U', 'R'], range(10))
-    problem.addVariables(['C1', 'C2', 'C3'], [0, 1])
+    # the figure's constraints only; words may start with 0
+    problem = word_puzzle('TWO+TWO=FOUR', leading_zeros=True)
+
+    pp.pprint(list(solve(problem)))
 
-    problem.addConstraint(AllDifferentConstraint(), ['T', 'W', 'O', 'F', 'U', 'R'])
-    problem.addConstraint(lambda O, R, C1: (2 * O) == R + (10 * C1), ('O', 'R', 'C1'))
-    problem.addConstraint(lambda W, U, C1, C2: C1 + (2 * W) == U + (10 * C2), ('W', 'U', 'C1', 'C2'))
-    problem.addConstraint(lambda T, O, C2, C3: C2 + (2 * T) == O + (10 * C3), ('T', 'O', 'C2', 'C3'))
-    problem.addConstraint(lambda F, C3: C3 == F, ('F', 'C3'))
 
-    pp.pprint(problem.getSolutions())
+def solve_word_puzzle(puzzle, parallel = False, mode = ALL_SOLUTIONS):
+    """
+    solve_word_puzzle()
+
+    @params - puzzle: sum such as 'SEND+MORE=MONEY', parallel: solve in a process pool,
+    mode: ALL_SOLUTIONS, FIRST_SOLUTION or COUNT_SOLUTIONS
+
+    print the solutions of puzzle (or their number) and the time taken to find them.
+    """
+    problem = word_puzzle(puzzle)
+    letters = sorted(set(letter for letter in puzzle.upper() if letter.isalpha()))
+    start_time = time.time()
+
+    if mode == COUNT_SOLUTIONS:
+        if parallel:
+            num_solutions = parallel_count(problem)
+        else:
+            num_solutions = sum(1 for solution in solve(problem))
+    else:
+        if parallel:
+            solutions = parallel_solve(problem, first_only=(mode == FIRST_SOLUTION))
+        else:
+            solutions = solve(problem)
+        num_solutions = 0
+        for solution in solutions:
+            print ' '.join('%s=%d' % (letter, solution[letter]) for letter in letters)
+            num_solutions += 1
+            if mode == FIRST_SOLUTION:
+                break
 
+    elapsed = time.time() - start_time
+    print num_solutions, "solution(s) in", '%.2f'%(elapsed * 1000), "ms"
+
+
+# Huffman-Clowes junction catalogue, in the conventions of Norvig's PAIP: '+' convex,
+# '-' concave, 'L'/'R' occluding boundary arrows. Each labelling lists the label of
+# every line at the junction, lines ordered as in the drawing (for an arrow the two
+# barbs then the shaft, for a T the two bar ends then the stem).
+JUNCTION_CATALOGUE = {'L': ['RL', 'LR', '+R', 'L+', '-L', 'R-'],
+                      'fork': ['+++', '---', 'LR-', '-LR', 'R-L'],
+                      'arrow': ['LR+', '--+', '++-'],
+                      'T': ['RL+', 'RL-', 'RLL', 'RLR']}
+
+LINE_LABELS = '+-LR'
+
+
+def line_label_mask(labels):
+    """
+    line_label_mask()
+
+    @params - labels: string of line labels
+
+    @returns - bitset over LINE_LABELS.
+    """
+    mask = 0
+    for label in labels:
+        mask |= 1 << LINE_LABELS.index(label)
+    return mask
+
+
+def compile_catalogue(catalogue):
+    """
+    compile_catalogue()
+
+    @params - catalogue: dictionary of junction type -> list of labellings
+
+    @returns - (SUPPORT, PROJECT) lookup tables, indexed [junction type][line slot][mask]:
+    SUPPORT maps a bitset of line labels to the bitset of labellings using one of them on that line,
+    PROJECT maps a bitset of labellings to the bitset of line labels they put on that line.
+    """
+    support = {}
+    project = {}
+    for junction_type, labellings in catalogue.items():
+        num_slots = len(labellings[0])
+        support[junction_type] = [[0] * (1 << len(LINE_LABELS)) for slot in range(num_slots)]
+        project[junction_type] = [[0] * (1 << len(labellings)) for slot in range(num_slots)]
+
+        for slot in range(num_slots):
+            for labels in range(1 << len(LINE_LABELS)):
+                for entry in range(len(labellings)):
+                    if labels & line_label_mask(labellings[entry][slot]):
+                        support[junction_type][slot][labels] |= 1 << entry
+            for entries in range(1 << len(labellings)):
+                for entry in range(len(labellings)):
+                    if entries & (1 << entry):
+                        project[junction_type][slot][entries] |= line_label_mask(labellings[entry][slot])
+    return support, project
+
+SUPPORT, PROJECT = compile_catalogue(JUNCTION_CATALOGUE)
+
+# an arrow pointing into a junction points out of the junction at the line's other end
+REVERSE = [0] * (1 << len(LINE_LABELS))
+for labels in range(1 << len(LINE_LABELS)):
+    REVERSE[labels] = (labels & 3) | ((labels & 4) << 1) | ((labels & 8) >> 1)
+
+
+def waltz_filtering(drawing):
+    """
+    waltz_filtering()
+
+    @params - drawing: dictionary of junction name -> (junction type, list of neighbouring junction names in catalogue order)
+
+    @returns - dictionary of junction name -> list of remaining labellings (empty lists if the drawing cannot be labelled),
+    number of revisions performed, seconds taken.
+
+    every junction starts with its whole catalogue as a bitmask; whenever a junction's mask shrinks its
+    neighbours are revised against it, each revision being two table lookups and a bitwise and.
+    """
+    start_time = time.time()
+
+    names = sorted(drawing)
+    index = dict((name, x) for x, name in enumerate(names))
+    types = [drawing[name][0] for name in names]
+    # lines[j] lists (neighbour, slot of the line at j, slot of the line at the neighbour)
+    lines = [[] for name in names]
+    for name in names:
+        neighbours = drawing[name][1]
+        for slot in range(len(neighbours)):
+            neighbour = neighbours[slot]
+            lines[index[name]].append((index[neighbour], slot, drawing[neighbour][1].index(name)))
+
+    masks = [(1 << len(JUNCTION_CATALOGUE[junction_type])) - 1 for junction_type in types]
+    queue = list(range(len(names)))
+    queued = [True for name in names]
+    revisions = 0
+    consistent = True
+
+    while queue and consistent:
+        junction = queue.pop()
+        queued[junction] = False
+        projection = PROJECT[types[junction]]
+        mask = masks[junction]
+
+        for neighbour, slot, neighbour_slot in lines[junction]:
+            revisions += 1
+            allowed = REVERSE[projection[slot][mask]]
+            reduced = masks[neighbour] & SUPPORT[types[neighbour]][neighbour_slot][allowed]
+            if reduced != masks[neighbour]:
+                masks[neighbour] = reduced
+                if not reduced:
+                    consistent = False
+                    break
+                if not queued[neighbour]:
+                    queue.append(neighbour)
+                    queued[neighbour] = True
+
+    labellings = {}
+    for x in range(len(names)):
+        catalogue = JUNCTION_CATALOGUE[types[x]]
+        labellings[names[x]] = [catalogue[entry] for entry in range(len(catalogue)) if consistent and masks[x] & (1 << entry)]
+
+    return labellings, revisions, time.time() - start_time
+
+
+def cube_drawing(copies = 1):
+    """
+    cube_drawing()
+
+    @params - copies: number of cubes in the drawing
+
+    @returns - drawing of copies separate cubes seen from a corner (the PAIP example), for measuring scaling.
+    """
+    cube = {'a': ('fork', ['b', 'c', 'd']),
+            'b': ('arrow', ['g', 'e', 'a']),
+            'c': ('arrow', ['e', 'f', 'a']),
+            'd': ('arrow', ['f', 'g', 'a']),
+            'e': ('L', ['c', 'b']),
+            'f': ('L', ['d', 'c']),
+            'g': ('L', ['b', 'd'])}
+
+    drawing = {}
+    for copy in range(copies):
+        for name, (junction_type, neighbours) in cube.items():
+            drawing['%s%d' % (name, copy)] = (junction_type, ['%s%d' % (neighbour, copy) for neighbour in neighbours])
+    return drawing
+
+
+def waltz():
+    """
+    waltz()
+
+    @params - None
+
+    label the cube drawing, then report revisions and time for growing numbers of cubes.
+    """
+    labellings, revisions, seconds = waltz_filtering(cube_drawing())
+    for name in sorted(labellings):
+        print name, labellings[name]
+    print
 
-def waltz_filtering():
-    pass
+    for copies in [1, 10, 100, 1000]:
+        labellings, revisions, seconds = waltz_filtering(cube_drawing(copies))
+        print copies * 7, "junctions:", revisions, "revisions in", '%.2f'%(seconds * 1000), "ms"
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "waltz":
+        waltz()
+        return
+    if len(sys.argv) > 2 and sys.argv[1] == "parallel":
+        solve_word_puzzle(sys.argv[2], True, sys.argv[3] if len(sys.argv) > 3 else ALL_SOLUTIONS)
+        return
+    if len(sys.argv) > 1:
+        solve_word_puzzle(sys.argv[1])
+        return
     cryptarithmetic()
 
 if __name__ == '__main__':
@@ -4,12 +4,43 @@
 #
 # Author: Anthony Shackell - June 15, 2018
 
-from pgmpy.models import BayesianModel
-from pgmpy.factors.discrete import TabularCPD
-from pgmpy.inference import VariableElimination, BeliefPropagation
+import time, multiprocessing
+from collections import OrderedDict
+import numpy
 
+NUM_SAMPLES = 100000
+# samples drawn per vectorized pass, bounding memory for very large sample counts
+SAMPLE_BATCH_SIZE = 1000000
+# posteriors and elimination plans remembered by a compiled network
+QUERY_CACHE_SIZE = 1024
+NUM_BATCH_QUERIES = 10000
+# numpy.einsum accepts at most 32 operands, so larger products are taken in chunks
+EINSUM_OPERANDS = 16
+# label of the leading batch axis of evidence-sliced factors (networkx never allows None as a node)
+BATCH = None
+
+# Gibbs sampling: chains run side by side in worker processes, ROUND_SWEEPS sweeps at a time,
+# until split R-hat and effective sample size reach their thresholds (or MAX_SWEEPS)
+NUM_CHAINS = 4
+ROUND_SWEEPS = 500
+MAX_SWEEPS = 50000
+RHAT_THRESHOLD = 1.01
+ESS_THRESHOLD = 400
+
+WORKER_CHAINS = {}
+
+
+def build_network():
+    """
+    build_network()
+
+    @params - None
+
+    @returns - the difficulty/musicianship/rating/exam/letter BayesianModel with its CPDs.
+    """
+    from pgmpy.models import BayesianModel
+    from pgmpy.factors.discrete import TabularCPD
 
-def main():
     # construct empty graph
     G = BayesianModel()
     # define nodes of graph
@@ -40,6 +71,640 @@ def main():
     # add CPDs to graph
     G.add_cpds(cpd_difficulty, cpd_musicianship, cpd_rating, cpd_exam, cpd_letter)
 
+    return G
+
+
+def network_tables(model):
+    """
+    network_tables()
+
+    @params - model: BayesianModel with CPDs
+
+    @returns - nodes in topological order, dictionary of node -> (parents, (states x parent configurations) table, parent cardinalities).
+    table columns enumerate parent states with the first parent most significant, as in TabularCPD.
+    """
+    import networkx
+    order = list(networkx.topological_sort(model))
+    tables = {}
+    for node in order:
+        cpd = model.get_cpds(node)
+        tables[node] = (list(cpd.variables[1:]), cpd.get_values(), [int(card) for card in cpd.cardinality[1:]])
+    return order, tables
+
+
+def forward_sample(order, tables, num_samples, random_state, evidence = None):
+    """
+    forward_sample()
+
+    @params - order/tables: from network_tables(), num_samples: number of samples, random_state: numpy RandomState,
+    evidence: optional dictionary of node -> observed state, clamped instead of sampled (likelihood weighting)
+
+    @returns - dictionary of node -> array of sampled states, array of sample weights (all 1 without evidence).
+
+    nodes are drawn in topological order with one vectorized draw per node over all samples.
+    """
+    evidence = evidence or {}
+    samples = {}
+    weights = numpy.ones(num_samples)
+
+    for node in order:
+        parents, table, parent_cards = tables[node]
+        if parents:
+            columns = numpy.ravel_multi_index([samples[parent] for parent in parents], parent_cards)
+        else:
+            columns = numpy.zeros(num_samples, dtype=numpy.intp)
+
+        if node in evidence:
+            samples[node] = numpy.repeat(evidence[node], num_samples)
+            weights *= table[evidence[node], columns]
+        else:
+            # the sampled state is the number of cumulative probabilities below a uniform draw
+            cumulative = table.cumsum(axis=0)
+            draws = random_state.rand(num_samples)
+            states = (draws[None, :] > cumulative[:, columns]).sum(axis=0)
+            # guard against cumulative sums a rounding error short of 1
+            samples[node] = numpy.minimum(states, table.shape[0] - 1)
+
+    return samples, weights
+
+
+def rejection_sampling(model, variable, evidence = None, num_samples = NUM_SAMPLES, random_state = None):
+    """
+    rejection_sampling()
+
+    @params - model: BayesianModel, variable: query node, evidence: dictionary of node -> observed state,
+    num_samples: number of samples drawn, random_state: numpy RandomState
+
+    @returns - estimated distribution of variable given evidence (None if no sample agreed with the evidence), number of samples kept.
+    """
+    random_state = random_state or numpy.random.RandomState()
+    evidence = evidence or {}
+    order, tables = network_tables(model)
+    counts = numpy.zeros(model.get_cpds(variable).variable_card)
+
+    for start in range(0, num_samples, SAMPLE_BATCH_SIZE):
+        samples = forward_sample(order, tables, min(SAMPLE_BATCH_SIZE, num_samples - start), random_state)[0]
+        consistent = numpy.ones(len(samples[variable]), dtype=bool)
+        for node, state in evidence.items():
+            consistent &= samples[node] == state
+        counts += numpy.bincount(samples[variable][consistent], minlength=len(counts))
+
+    if not counts.sum():
+        return None, 0
+    return counts / counts.sum(), int(counts.sum())
+
+
+def likelihood_weighting(model, variable, evidence = None, num_samples = NUM_SAMPLES, random_state = None):
+    """
+    likelihood_weighting()
+
+    @params - model: BayesianModel, variable: query node, evidence: dictionary of node -> observed state,
+    num_samples: number of samples drawn, random_state: numpy RandomState
+
+    @returns - estimated distribution of variable given evidence.
+    """
+    random_state = random_state or numpy.random.RandomState()
+    order, tables = network_tables(model)
+    totals = numpy.zeros(model.get_cpds(variable).variable_card)
+
+    for start in range(0, num_samples, SAMPLE_BATCH_SIZE):
+        samples, weights = forward_sample(order, tables, min(SAMPLE_BATCH_SIZE, num_samples - start), random_state, evidence)
+        totals += numpy.bincount(samples[variable], weights=weights, minlength=len(totals))
+
+    return totals / totals.sum()
+
+
+def compare_sampling(model, infer, variable, evidence = None, num_samples = NUM_SAMPLES):
+    """
+    compare_sampling()
+
+    @params - model: BayesianModel, infer: VariableElimination over model, variable: query node,
+    evidence: dictionary of node -> observed state, num_samples: number of samples drawn
+
+    print the exact posterior of variable next to the rejection sampling and likelihood weighting estimates, with their runtimes.
+    """
+    start_time = time.time()
+    exact = infer.query([variable], evidence=evidence) [variable].values
+    exact_time = time.time() - start_time
+
+    start_time = time.time()
+    rejection, num_kept = rejection_sampling(model, variable, evidence, num_samples)
+    rejection_time = time.time() - start_time
+
+    start_time = time.time()
+    weighted = likelihood_weighting(model, variable, evidence, num_samples)
+    weighted_time = time.time() - start_time
+
+    print "P(" + variable + " | " + str(evidence or {}) + ")"
+    print "  variable elimination: ", numpy.round(exact, 4), '%8.4f s'%exact_time
+    print "  rejection sampling:   ", numpy.round(rejection, 4) if rejection is not None else None, '%8.4f s'%rejection_time, "(" + str(num_kept), "samples kept)"
+    print "  likelihood weighting: ", numpy.round(weighted, 4), '%8.4f s'%weighted_time
+
+
+def compile_network(model, cache_size = QUERY_CACHE_SIZE):
+    """
+    compile_network()
+
+    @params - model: BayesianModel with CPDs, cache_size: number of posteriors (and of elimination plans) kept in the LRU caches
+
+    @returns - compiled network dictionary: CPDs as numpy factors (one axis per variable), parents, children,
+    ancestors (each node included), and empty caches.
+    """
+    order, tables = network_tables(model)
+    factors = {}
+    cardinality = {}
+    parents = {}
+    children = dict((node, []) for node in order)
+    ancestors = {}
+    for node in order:
+        node_parents, table, parent_cards = tables[node]
+        factors[node] = ((node,) + tuple(node_parents), table.reshape([table.shape[0]] + parent_cards))
+        cardinality[node] = table.shape[0]
+        parents[node] = node_parents
+        # topological order: every parent's ancestors are already known
+        ancestors[node] = set([node]).union(*[ancestors[parent] for parent in node_parents])
+        for parent in node_parents:
+            children[parent].append(node)
+
+    return {'order': order,
+            'factors': factors,
+            'cardinality': cardinality,
+            'parents': parents,
+            'children': children,
+            'ancestors': ancestors,
+            'cache_size': cache_size,
+            'queries': OrderedDict(),
+            'plans': OrderedDict(),
+            'hits': 0,
+            'misses': 0}
+
+
+def cache_get(cache, key):
+    """
+    cache_get()
+
+    @params - cache: OrderedDict used as an LRU cache, key: cache key
+
+    @returns - cached value (now most recently used), or None.
+    """
+    value = cache.pop(key, None)
+    if value is not None:
+        cache[key] = value
+    return value
+
+
+def cache_put(cache, key, value, size):
+    """
+    cache_put()
+
+    @params - cache: OrderedDict used as an LRU cache, key: cache key, value: value to remember, size: maximum number of entries
+    """
+    cache[key] = value
+    while len(cache) > size:
+        cache.popitem(last=False)
+
+
+def multiply_factors(factors, variables):
+    """
+    multiply_factors()
+
+    @params - factors: list of (variables, array) factors, variables: variables kept in the product, in output order
+
+    @returns - (variables, array) product of factors with every other variable summed out.
+    """
+    factors = list(factors)
+    while len(factors) > EINSUM_OPERANDS:
+        chunk, factors = factors[:EINSUM_OPERANDS], factors[EINSUM_OPERANDS:]
+        needed = set(variables).union(variable for factor_variables, values in factors for variable in factor_variables)
+        scope = []
+        for factor_variables, values in chunk:
+            scope.extend(variable for variable in factor_variables if variable in needed and variable not in scope)
+        factors.append(multiply_factors(chunk, scope))
+
+    labels = {}
+    operands = []
+    for factor_variables, values in factors:
+        operands.append(values)
+        operands.append([labels.setdefault(variable, len(labels)) for variable in factor_variables])
+    operands.append([labels[variable] for variable in variables])
+    return tuple(variables), numpy.einsum(*operands)
+
+
+def reduce_factor(factor, evidence):
+    """
+    reduce_factor()
+
+    @params - factor: (variables, array) factor, evidence: dictionary of node -> observed state, or of node -> array of
+    observed states (one per query)
+
+    @returns - (variables, array) factor with the evidence axes indexed out; array states leave a leading BATCH axis instead.
+    """
+    variables, values = factor
+    observed = [x for x in range(len(variables)) if variables[x] in evidence]
+    if not observed:
+        return factor
+    kept = [x for x in range(len(variables)) if variables[x] not in evidence]
+    # with the evidence axes first, indexing them all puts any batch axis in front of the kept axes
+    values = values.transpose(observed + kept)[tuple(evidence[variables[x]] for x in observed)]
+    kept_variables = tuple(variables[x] for x in kept)
+    if values.ndim > len(kept):
+        kept_variables = (BATCH,) + kept_variables
+    return kept_variables, values
+
+
+def elimination_plan(compiled, evidence_variables, variables):
+    """
+    elimination_plan()
+
+    @params - compiled: compiled network, evidence_variables: sorted tuple of observed variables,
+    variables: sorted tuple of query variables (none of them observed)
+
+    @returns - elimination plan dictionary (cached by (evidence_variables, variables)): 'inputs' (slot, node) CPDs sliced
+    at the evidence of each query, 'constants' slot -> factor products that do not depend on the evidence, 'steps'
+    (input slots, output slot, scope) multiplications left for query time, and 'outputs' slots multiplied into 'variables'.
+
+    only the CPDs of the observed and query variables and their ancestors are used. evidence axes are sliced away, so
+    factors touching the evidence carry a BATCH axis instead; the rest are eliminated greedily, always summing out the
+    variable whose combined factor is smallest, and eliminations that never touch the evidence are done here, once.
+    """
+    key = (evidence_variables, variables)
+    plan = cache_get(compiled['plans'], key)
+    if plan is not None:
+        return plan
+
+    relevant = set().union(*[compiled['ancestors'][node] for node in evidence_variables + variables])
+    observed = set(evidence_variables)
+    cardinality = compiled['cardinality']
+
+    scopes = {}
+    inputs = []
+    constants = {}
+    for node in compiled['order']:
+        if node not in relevant:
+            continue
+        slot = len(scopes)
+        factor_variables = compiled['factors'][node][0]
+        if observed.intersection(factor_variables):
+            scopes[slot] = (BATCH,) + tuple(variable for variable in factor_variables if variable not in observed)
+            inputs.append((slot, node))
+        else:
+            scopes[slot] = factor_variables
+            constants[slot] = compiled['factors'][node]
+
+    steps = []
+    next_slot = len(scopes)
+    eliminate = relevant - observed - set(variables)
+    while eliminate:
+        def elimination_cost(variable):
+            scope = set()
+            for factor_variables in scopes.values():
+                if variable in factor_variables:
+                    scope.update(factor_variables)
+            return numpy.prod([cardinality[other] for other in scope if other is not BATCH])
+
+        variable = min(sorted(eliminate), key=elimination_cost)
+        related = sorted(slot for slot in scopes if variable in scopes[slot])
+        others = set(other for slot in related for other in scopes[slot]) - set([variable])
+        scope = ((BATCH,) if BATCH in others else ()) + tuple(sorted(others - set([BATCH])))
+        if all(slot in constants for slot in related):
+            constants[next_slot] = multiply_factors([constants.pop(slot) for slot in related], scope)
+        else:
+            steps.append((related, next_slot, scope))
+        for slot in related:
+            del scopes[slot]
+        scopes[next_slot] = scope
+        next_slot += 1
+        eliminate.remove(variable)
+
+    batched = any(BATCH in scope for scope in scopes.values())
+    plan = {'inputs': inputs,
+            'constants': constants,
+            'steps': steps,
+            'outputs': sorted(scopes),
+            'variables': ((BATCH,) if batched else ()) + variables}
+    cache_put(compiled['plans'], key, plan, compiled['cache_size'])
+    return plan
+
+
+def run_plan(compiled, plan, evidence):
+    """
+    run_plan()
+
+    @params - compiled: compiled network, plan: from elimination_plan(), evidence: dictionary of node -> array of
+    observed states, one per query
+
+    @returns - unnormalized joint over the plan's query variables, with a leading batch axis when there is evidence.
+    """
+    factors = dict(plan['constants'])
+    for slot, node in plan['inputs']:
+        factors[slot] = reduce_factor(compiled['factors'][node], evidence)
+    for related, slot, scope in plan['steps']:
+        factors[slot] = multiply_factors([factors.pop(other) for other in related], scope)
+    return multiply_factors([factors[slot] for slot in plan['outputs']], plan['variables'])[1]
+
+
+def posterior_marginals(variables, joint_variables, conditional):
+    """
+    posterior_marginals()
+
+    @params - variables: query variables, joint_variables: axes of conditional after any leading batch axis,
+    conditional: normalized joint posterior over the query variables
+
+    @returns - dictionary of variable -> marginal posterior (with the batch axis first, if any).
+    """
+    offset = conditional.ndim - len(joint_variables)
+    marginals = {}
+    for variable in variables:
+        axis = joint_variables.index(variable)
+        other_axes = tuple(offset + other for other in range(len(joint_variables)) if other != axis)
+        marginals[variable] = conditional.sum(axis=other_axes)
+    return marginals
+
+
+def compiled_query(compiled, variables, evidence = None):
+    """
+    compiled_query()
+
+    @params - compiled: compiled network, variables: list of query variables, evidence: dictionary of node -> observed state
+
+    @returns - dictionary of variable -> read-only posterior marginal array, like VariableElimination.query
+    (cached by (variables, evidence)).
+    """
+    evidence = evidence or {}
+    key = (tuple(sorted(variables)), tuple(sorted(evidence.items())))
+    posterior = cache_get(compiled['queries'], key)
+    if posterior is not None:
+        compiled['hits'] += 1
+        return dict(posterior)
+    compiled['misses'] += 1
+
+    posterior = batch_query(compiled, variables, [evidence])[0]
+    # the cached arrays are handed out again on every hit
+    for marginal in posterior.values():
+        marginal.flags.writeable = False
+    cache_put(compiled['queries'], key, posterior, compiled['cache_size'])
+    return dict(posterior)
+
+
+def batch_query(compiled, variables, evidence_list):
+    """
+    batch_query()
+
+    @params - compiled: compiled network, variables: list of query variables, evidence_list: list of evidence dictionaries
+
+    @returns - list of posteriors (dictionaries of variable -> marginal array), one per evidence dictionary.
+
+    queries sharing the same evidence variables are answered together: one cached elimination plan, run once
+    with a leading batch axis over all of their evidence values, then a single normalization.
+    """
+    groups = OrderedDict()
+    for x in range(len(evidence_list)):
+        groups.setdefault(tuple(sorted(evidence_list[x])), []).append(x)
+
+    posteriors = [None for evidence in evidence_list]
+    for evidence_variables, indexes in groups.items():
+        joint_variables = tuple(sorted(set(variables) - set(evidence_variables)))
+        plan = elimination_plan(compiled, evidence_variables, joint_variables)
+        states = dict((variable, numpy.array([evidence_list[x][variable] for x in indexes], dtype=numpy.intp)) for variable in evidence_variables)
+
+        conditional = run_plan(compiled, plan, states)
+        if not evidence_variables:
+            conditional = conditional[None].repeat(len(indexes), axis=0)
+        normalizer = conditional.reshape(len(indexes), -1).sum(axis=1)
+        conditional = conditional / normalizer.reshape((len(indexes),) + (1,) * len(joint_variables))
+
+        marginals = posterior_marginals(variables, joint_variables, conditional)
+        for row in range(len(indexes)):
+            posteriors[indexes[row]] = dict((variable, marginals[variable][row]) for variable in variables)
+    return posteriors
+
+
+def compare_compiled(model, infer, num_queries = NUM_BATCH_QUERIES):
+    """
+    compare_compiled()
+
+    @params - model: BayesianModel, infer: VariableElimination over model, num_queries: size of the random query batch
+
+    answer a batch of random letter queries with the compiled network and check a sample of them against variable elimination.
+    """
+    random_state = numpy.random.RandomState(0)
+    evidence_list = [{'musicianship': random_state.randint(2), 'exam': random_state.randint(2), 'rating': random_state.randint(3)} for x in range(num_queries)]
+
+    start_time = time.time()
+    compiled = compile_network(model)
+    compile_time = time.time() - start_time
+
+    start_time = time.time()
+    posteriors = batch_query(compiled, ['letter'], evidence_list)
+    batch_time = time.time() - start_time
+
+    start_time = time.time()
+    for evidence in evidence_list:
+        compiled_query(compiled, ['letter'], evidence)
+    cached_time = time.time() - start_time
+
+    num_checked = 20
+    start_time = time.time()
+    errors = [numpy.abs(infer.query(['letter'], evidence=evidence_list[x]) ['letter'].values - posteriors[x]['letter']).max() for x in range(num_checked)]
+    exact_time = (time.time() - start_time) / num_checked
+
+    print "compile:", '%.4f s'%compile_time
+    print "batch of", num_queries, "queries:", '%.4f s'%batch_time
+    print "same queries one at a time through the cache:", '%.4f s'%cached_time, "(" + str(compiled['hits']), "hits,", compiled['misses'], "misses)"
+    print "variable elimination: %.4f s per query, largest difference over %d queries: %.2e" % (exact_time, num_checked, max(errors))
+
+
+def blanket_conditionals(compiled, evidence = None):
+    """
+    blanket_conditionals()
+
+    @params - compiled: compiled network, evidence: dictionary of node -> observed state (these nodes are never resampled)
+
+    @returns - list of (node index, unobserved Markov blanket indexes, blanket strides, cumulative table) for every
+    unobserved node, in topological order. column blanket_states.dot(strides) of the table is the distribution of the
+    node given its blanket; observed neighbours are sliced at their states, so they add no columns.
+    """
+    evidence = evidence or {}
+    order = compiled['order']
+    position = dict((node, x) for x, node in enumerate(order))
+
+    conditionals = []
+    for node in order:
+        if node in evidence:
+            continue
+        # P(node | blanket) is proportional to P(node | parents) times P(child | parents of child) for every child
+        factors = [reduce_factor(compiled['factors'][node], evidence)]
+        factors.extend(reduce_factor(compiled['factors'][child], evidence) for child in compiled['children'][node])
+        blanket = sorted(set(variable for factor in factors for variable in factor[0]) - set([node]), key=position.get)
+        table = multiply_factors(factors, [node] + blanket)[1].reshape(compiled['cardinality'][node], -1)
+
+        totals = table.sum(axis=0)
+        # blanket states that cannot occur get a uniform column instead of 0 / 0
+        table = numpy.where(totals > 0, table / numpy.where(totals > 0, totals, 1), 1.0 / table.shape[0])
+
+        cards = [compiled['cardinality'][variable] for variable in blanket]
+        strides = numpy.array([int(numpy.prod(cards[x + 1:])) for x in range(len(cards))], dtype=numpy.intp)
+        conditionals.append((position[node], numpy.array([position[variable] for variable in blanket], dtype=numpy.intp),
+                             strides, table.cumsum(axis=0)))
+    return conditionals
+
+
+def attach_chains(conditionals, traced):
+    """
+    attach_chains()
+
+    @params - conditionals: from blanket_conditionals(), traced: indexes of the nodes whose states are recorded
+
+    worker initializer: keep the conditional tables so tasks only carry chain states.
+    """
+    WORKER_CHAINS['conditionals'] = conditionals
+    WORKER_CHAINS['traced'] = traced
+
+
+def run_chain(task):
+    """
+    run_chain()
+
+    @params - task: (chain state array, numpy RandomState, number of sweeps)
+
+    @returns - final state, advanced random state, (sweeps x traced nodes) array of traced states after each sweep.
+    """
+    state, random_state, num_sweeps = task
+    conditionals = WORKER_CHAINS['conditionals']
+    traced = WORKER_CHAINS['traced']
+    trace = numpy.empty((num_sweeps, len(traced)), dtype=numpy.intp)
+    draws = random_state.rand(num_sweeps, len(conditionals))
+
+    for sweep in range(num_sweeps):
+        for x in range(len(conditionals)):
+            index, blanket, strides, cumulative = conditionals[x]
+            column = cumulative[:, state[blanket].dot(strides)]
+            state[index] = min((draws[sweep, x] > column).sum(), len(column) - 1)
+        trace[sweep] = state[traced]
+
+    return state, random_state, trace
+
+
+def convergence(draws):
+    """
+    convergence()
+
+    @params - draws: (chains x draws) array of one scalar quantity
+
+    @returns - split R-hat, effective sample size (autocorrelations combined over chains, summed until the first negative pair).
+    """
+    num_chains, num_draws = draws.shape
+    half = num_draws // 2
+    # split every chain in two, so a chain that drifts also shows up as disagreeing halves
+    draws = numpy.concatenate([draws[:, :half], draws[:, half:2 * half]])
+    num_chains, num_draws = draws.shape
+
+    chain_means = draws.mean(axis=1)
+    within = draws.var(axis=1, ddof=1).mean()
+    between = num_draws * chain_means.var(ddof=1)
+    variance = (num_draws - 1.0) / num_draws * within + between / num_draws
+    if variance == 0:
+        # every chain stuck on the same value: nothing left to mix
+        return 1.0, float(num_chains * num_draws)
+    if within == 0:
+        return numpy.inf, 1.0
+    rhat = numpy.sqrt(variance / within)
+
+    centered = draws - chain_means[:, None]
+    spectrum = numpy.fft.rfft(centered, 2 * num_draws, axis=1)
+    autocovariance = numpy.fft.irfft(spectrum * spectrum.conjugate(), 2 * num_draws, axis=1)[:, :num_draws] / num_draws
+    rho = 1 - (within - autocovariance.mean(axis=0)) / variance
+
+    pairs = rho[:2 * (num_draws // 2)].reshape(-1, 2).sum(axis=1)
+    negative = numpy.flatnonzero(pairs < 0)
+    if len(negative):
+        pairs = pairs[:negative[0]]
+    tau = max(-1 + 2 * pairs.sum(), 1.0 / numpy.log10(num_chains * num_draws))
+    return rhat, num_chains * num_draws / tau
+
+
+def gibbs_sampling(compiled, variables, evidence = None, num_chains = NUM_CHAINS, round_sweeps = ROUND_SWEEPS,
+                   max_sweeps = MAX_SWEEPS, rhat_threshold = RHAT_THRESHOLD, ess_threshold = ESS_THRESHOLD,
+                   processes = None, seed = 0):
+    """
+    gibbs_sampling()
+
+    @params - compiled: compiled network, variables: list of query variables, evidence: dictionary of node -> observed state,
+    num_chains: chains run in parallel, round_sweeps: sweeps per chain between convergence checks,
+    max_sweeps: sweeps per chain before giving up, rhat_threshold/ess_threshold: convergence criteria,
+    processes: worker count (default: number of CPUs), seed: random seed
+
+    @returns - generator of (variable, estimated marginal, converged, worst R-hat, smallest ESS, sweeps per chain),
+    one per query variable, yielded as soon as every state of that variable has converged.
+
+    chains start from forward samples with the evidence clamped; the first half of every chain is discarded as burn-in.
+    """
+    evidence = evidence or {}
+    order = compiled['order']
+    conditionals = blanket_conditionals(compiled, evidence)
+    traced = numpy.array([order.index(variable) for variable in variables], dtype=numpy.intp)
+
+    random_state = numpy.random.RandomState(seed)
+    tables = dict((node, (compiled['parents'][node], compiled['factors'][node][1].reshape(compiled['cardinality'][node], -1),
+                          [compiled['cardinality'][parent] for parent in compiled['parents'][node]])) for node in order)
+    samples = forward_sample(order, tables, num_chains, random_state, evidence)[0]
+    states = [numpy.array([samples[node][chain] for node in order], dtype=numpy.intp) for chain in range(num_chains)]
+    random_states = [numpy.random.RandomState(random_state.randint(2 ** 31)) for chain in range(num_chains)]
+    traces = [[] for chain in range(num_chains)]
+
+    pending = list(variables)
+    num_sweeps = 0
+    pool = multiprocessing.Pool(processes, attach_chains, (conditionals, traced))
+    try:
+        while pending and num_sweeps < max_sweeps:
+            sweeps = min(round_sweeps, max_sweeps - num_sweeps)
+            results = pool.map(run_chain, [(states[chain], random_states[chain], sweeps) for chain in range(num_chains)])
+            for chain in range(num_chains):
+                states[chain], random_states[chain], trace = results[chain]
+                traces[chain].append(trace)
+            num_sweeps += sweeps
+
+            kept = numpy.array([numpy.concatenate(trace) for trace in traces])[:, num_sweeps // 2:]
+            finished = num_sweeps >= max_sweeps
+            for variable in pending[:]:
+                draws = kept[:, :, variables.index(variable)]
+                statistics = [convergence((draws == state).astype(float)) for state in range(compiled['cardinality'][variable])]
+                rhat = max(statistic[0] for statistic in statistics)
+                ess = min(statistic[1] for statistic in statistics)
+                converged = rhat < rhat_threshold and ess >= ess_threshold
+                if converged or finished:
+                    marginal = numpy.bincount(draws.ravel(), minlength=compiled['cardinality'][variable]) / float(draws.size)
+                    pending.remove(variable)
+                    yield variable, marginal, converged, rhat, ess, num_sweeps
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def compare_gibbs(model, variables, evidence = None):
+    """
+    compare_gibbs()
+
+    @params - model: BayesianModel, variables: list of query variables, evidence: dictionary of node -> observed state
+
+    print Gibbs sampling marginals as they converge, next to the exact posteriors.
+    """
+    compiled = compile_network(model)
+    exact = compiled_query(compiled, variables, evidence)
+
+    print "P(" + ", ".join(variables) + " | " + str(evidence or {}) + ")"
+    start_time = time.time()
+    for variable, marginal, converged, rhat, ess, num_sweeps in gibbs_sampling(compiled, variables, evidence):
+        print "  %-13s exact: %-24s Gibbs: %-24s %s after %d sweeps x %d chains, R-hat %.4f, ESS %.0f, %.2f s" % (
+            variable, numpy.round(exact[variable], 4), numpy.round(marginal, 4), "converged" if converged else "stopped",
+            num_sweeps, NUM_CHAINS, rhat, ess, time.time() - start_time)
+
+
+def main():
+    from pgmpy.inference import VariableElimination
+    G = build_network()
+
     # construct inference object
     infer = VariableElimination(G)
 
@@ -51,7 +716,18 @@ def main():
     print "\nQuestion 2 (weak musician):\n", infer.query(['letter'], evidence={'musicianship': 0}) ['letter']
 
     # Question 3:
-    print "\nRejection Sampling (100000 samples):\n"
+    print "\nRejection Sampling (" + str(NUM_SAMPLES) + " samples):\n"
+    compare_sampling(G, infer, 'letter', {'musicianship': 1, 'difficulty': 0, 'exam': 1, 'rating': 1})
+    compare_sampling(G, infer, 'letter')
+    compare_sampling(G, infer, 'letter', {'musicianship': 0})
+    compare_sampling(G, infer, 'musicianship', {'letter': 1, 'exam': 0})
+
+    print "\nCompiled inference:\n"
+    compare_compiled(G, infer)
+
+    print "\nGibbs sampling (" + str(NUM_CHAINS) + " chains):\n"
+    compare_gibbs(G, ['letter', 'difficulty'], {'musicianship': 1, 'exam': 1})
+    compare_gibbs(G, ['musicianship', 'difficulty', 'rating'], {'letter': 1, 'exam': 0})
 
 
 if __name__ == '__main__':
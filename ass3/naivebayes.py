@@ -5,95 +5,376 @@
 #
 # Author: Anthony Shackell - June 15, 2018
 
-import os, numpy
-from os.path import isfile, join
-from sklearn.model_selection import KFold, cross_val_score
-from sklearn import svm
-from sklearn.naive_bayes import BernoulliNB, MultinomialNB
+import os, sys, time, tempfile, multiprocessing, numpy
+from os.path import abspath, dirname, join
+import nbmodel
+
+# the corpus readers live next to the corpus in ass2
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', 'ass2'))
+import corpuspack, tokenizer
 
 SEARCH_WORDS = ['awful', 'bad', 'boring', 'dull', 'effective', 'enjoyable', 'great', 'hilarious']
+VOCABULARY = tokenizer.build_vocabulary(SEARCH_WORDS)
+# reused by every call to tokenizer.encode()
+TOKEN_IDS = tokenizer.new_id_buffer()
 
-POSITIVE_REVIEW_DIRECTORY = '/Users/ashackell/git/CSC421/ass2/review_polarity/txt_sentoken/pos'
-NEGATIVE_REVIEW_DIRECTORY = '/Users/ashackell/git/CSC421/ass2/review_polarity/txt_sentoken/neg'
+# corpus directory (with 'pos' and 'neg' subdirectories) or a pack built by corpuspack.py
+REVIEW_CORPUS = join(dirname(abspath(__file__)), '..', 'ass2', 'review_polarity', 'txt_sentoken')
 
 NUM_FOLDS = 10
+# number of reviews held in memory at once when training in streaming mode
+STREAM_BATCH_SIZE = 500
 
 POSITIVE_DATA = []
 NEGATIVE_DATA = []
 
+# sklearn.naive_bayes class names, imported by new_classifier() only when a classifier is needed
+CLASSIFIERS = {'bernoulli': 'BernoulliNB', 'multinomial': 'MultinomialNB'}
+
+# feature matrices attached by each cross-validation worker process
+WORKER_DATA = {}
+
+def count_search_words(content):
+    """
+    count_search_words()
+
+    @params - content: text of a single review
+
+    @returns - feature vector holding the number of occurrences of each of SEARCH_WORDS.
+    """
+    num_ids = tokenizer.encode(content, VOCABULARY, TOKEN_IDS)
+    return tokenizer.count_ids(TOKEN_IDS, num_ids, len(SEARCH_WORDS))
+
+
 def build_vectors(pos_file_list = [], neg_file_list = []):
 
     global SEARCH_WORDS, POSITIVE_DATA, NEGATIVE_DATA
 
-    for filename in pos_file_list:
-        feature_vector = [0.0 for x in range(len(SEARCH_WORDS))]
+    for document in pos_file_list:
+        content = corpuspack.document_content(document)
         # skip directories
-        if not isfile(filename):
+        if content is None:
             continue
-        file = open(filename, 'r')
-        content = file.read()
-        for word in content.split():
-            if word.lower() in SEARCH_WORDS:
-                feature_vector[SEARCH_WORDS.index(word)] += 1
+        POSITIVE_DATA.append(count_search_words(content))
+
+    for document in neg_file_list:
+        content = corpuspack.document_content(document)
+        # skip directories
+        if content is None:
+            continue
+        NEGATIVE_DATA.append(count_search_words(content))
+
 
-        file.close()
-        POSITIVE_DATA.append(feature_vector)
+def stream_corpus(path):
+    """
+    stream_corpus()
 
-    for filename in neg_file_list:
-        feature_vector = [0.0 for x in range(len(SEARCH_WORDS))]
+    @params - path: corpus directory or pack file
+
+    @returns - generator of (label, content) pairs, reading one review at a time.
+    """
+    if corpuspack.is_pack(path):
+        documents = corpuspack.read_pack(path)
+    else:
+        documents = corpuspack.corpus_files(path)
+
+    for label, document in documents:
+        content = corpuspack.document_content(document)
         # skip directories
-        if not isfile(filename):
+        if content is None:
             continue
-        file = open(filename, 'r')
-        content = file.read()
-        for word in content.split():
-            if word.lower() in SEARCH_WORDS:
-                feature_vector[SEARCH_WORDS.index(word)] += 1
+        yield label, content
 
-        file.close()
-        NEGATIVE_DATA.append(feature_vector)
 
+def stream_file(filename):
+    """
+    stream_file()
 
-def main():
-    positive_reviews = [ join(POSITIVE_REVIEW_DIRECTORY, filename) for filename in os.listdir(POSITIVE_REVIEW_DIRECTORY) ]
-    negative_reviews = [ join(NEGATIVE_REVIEW_DIRECTORY, filename) for filename in os.listdir(NEGATIVE_REVIEW_DIRECTORY) ]
-    bernoulli = BernoulliNB()
-    multinomial = MultinomialNB()
+    @params - filename: file holding one review per line, formatted as '<label>\\t<review text>'
+
+    @returns - generator of (label, content) pairs, reading one line at a time.
+    """
+    file = open(filename, 'r')
+    for line in file:
+        label, separator, content = line.partition('\t')
+        if not separator:
+            continue
+        yield int(label), content
+    file.close()
+
+
+def stream_batches(documents, batch_size = STREAM_BATCH_SIZE):
+    """
+    stream_batches()
+
+    @params - documents: iterable of (label, content) pairs, batch_size: maximum number of reviews per batch
+
+    @returns - generator of (X, y) mini-batches of count feature vectors and labels.
+
+    the same batch arrays are refilled for every batch, so memory use depends only on batch_size.
+    consumers must be done with a batch before asking for the next one.
+    """
+    X = numpy.zeros((batch_size, len(SEARCH_WORDS)))
+    y = numpy.zeros(batch_size, dtype=int)
+    num_rows = 0
+
+    for label, content in documents:
+        X[num_rows] = count_search_words(content)
+        y[num_rows] = label
+        num_rows += 1
+        if num_rows == batch_size:
+            yield X, y
+            num_rows = 0
+
+    if num_rows:
+        yield X[:num_rows], y[:num_rows]
+
+
+def new_classifier(name):
+    """
+    new_classifier()
+
+    @params - name: key of CLASSIFIERS
+
+    @returns - untrained sklearn naive Bayes classifier.
+    """
+    from sklearn import naive_bayes
+    return getattr(naive_bayes, CLASSIFIERS[name])()
+
+
+def stream_train(documents, batch_size = STREAM_BATCH_SIZE):
+    """
+    stream_train()
+
+    @params - documents: iterable of (label, content) pairs, batch_size: maximum number of reviews per batch
+
+    @returns - Bernoulli and Multinomial classifiers trained with partial_fit, number of reviews seen.
+    """
+    # BernoulliNB binarizes the count vectors itself (binarize=0.0)
+    bernoulli = new_classifier('bernoulli')
+    multinomial = new_classifier('multinomial')
+    classes = numpy.array([0, 1])
+    num_documents = 0
+
+    for X, y in stream_batches(documents, batch_size):
+        # early batches may hold a single class, whose log prior is -inf until the other class shows up
+        with numpy.errstate(divide='ignore'):
+            bernoulli.partial_fit(X, y, classes=classes)
+            multinomial.partial_fit(X, y, classes=classes)
+        num_documents += len(y)
+
+    return bernoulli, multinomial, num_documents
+
+
+def stream_score(classifiers, documents, batch_size = STREAM_BATCH_SIZE):
+    """
+    stream_score()
+
+    @params - classifiers: list of trained classifiers, documents: iterable of (label, content) pairs, batch_size: maximum number of reviews per batch
+
+    @returns - accuracy of each classifier over documents.
+    """
+    num_correct = [0 for classifier in classifiers]
+    num_documents = 0
+
+    for X, y in stream_batches(documents, batch_size):
+        for x in range(len(classifiers)):
+            num_correct[x] += (classifiers[x].predict(X) == y).sum()
+        num_documents += len(y)
+
+    return [float(correct) / num_documents for correct in num_correct]
+
+
+def stream_documents(corpus_file = None):
+    """
+    stream_documents()
+
+    @params - corpus_file: optional corpus directory, pack file or single file of labelled reviews (default: REVIEW_CORPUS)
+
+    @returns - generator of (label, content) pairs.
+    """
+    if corpus_file is None:
+        corpus_file = REVIEW_CORPUS
+    if os.path.isdir(corpus_file) or corpuspack.is_pack(corpus_file):
+        return stream_corpus(corpus_file)
+    return stream_file(corpus_file)
 
+
+def stream_main(args):
+    """
+    stream_main()
+
+    @params - args: [batch_size [corpus_file]]
+
+    train both classifiers out-of-core and report their accuracy over a second pass of the corpus.
+    """
+    batch_size = int(args[0]) if args else STREAM_BATCH_SIZE
+    corpus_file = args[1] if len(args) > 1 else None
+
+    bernoulli, multinomial, num_documents = stream_train(stream_documents(corpus_file), batch_size)
+    bernoulli_accuracy, multinomial_accuracy = stream_score([bernoulli, multinomial], stream_documents(corpus_file), batch_size)
+
+    print "reviews streamed:", num_documents, "in batches of", batch_size
+    print "Bernoulli training-set accuracy:", '%.1f'%(bernoulli_accuracy*100), "%"
+    print "Multinomial training-set accuracy:", '%.1f'%(multinomial_accuracy*100), "%"
+
+
+def share_array(array):
+    """
+    share_array()
+
+    @params - array: numpy array to be shared with worker processes
+
+    @returns - (filename, dtype, shape) of a memmap holding a copy of array. The caller removes the file.
+    """
+    file_descriptor, filename = tempfile.mkstemp(suffix='.memmap')
+    os.close(file_descriptor)
+    shared = numpy.memmap(filename, dtype=array.dtype, mode='w+', shape=array.shape)
+    shared[:] = array
+    shared.flush()
+    del shared
+    return filename, array.dtype.str, array.shape
+
+
+def attach_shared_arrays(shared_arrays):
+    """
+    attach_shared_arrays()
+
+    @params - shared_arrays: dictionary of name -> (filename, dtype, shape) from share_array()
+
+    worker initializer: map every shared array read-only, so tasks only carry (name, fold) and never the data.
+    """
+    for name, (filename, dtype, shape) in shared_arrays.items():
+        WORKER_DATA[name] = numpy.memmap(filename, dtype=numpy.dtype(dtype), mode='r', shape=shape)
+
+
+def cross_validate_fold(task):
+    """
+    cross_validate_fold()
+
+    @params - task: (classifier name, fold number, number of folds)
+
+    @returns - (classifier name, fold number, accuracy, fit seconds, score seconds)
+    """
+    name, fold, num_folds = task
+    X = WORKER_DATA[name]
+    y = WORKER_DATA['y']
+
+    from sklearn.model_selection import KFold
+    for index, (train, test) in enumerate(KFold(n_splits=num_folds).split(X)):
+        if index == fold:
+            break
+
+    start_time = time.time()
+    classifier = new_classifier(name).fit(X[train], y[train])
+    fit_time = time.time() - start_time
+
+    start_time = time.time()
+    accuracy = classifier.score(X[test], y[test])
+    score_time = time.time() - start_time
+
+    return name, fold, accuracy, fit_time, score_time
+
+
+def parallel_cross_validate(matrices, y, num_folds = NUM_FOLDS, processes = None):
+    """
+    parallel_cross_validate()
+
+    @params - matrices: dictionary of classifier name -> feature matrix, y: labels, num_folds: number of folds, processes: worker count (default: number of CPUs)
+
+    @returns - list of (classifier name, fold number, accuracy, fit seconds, score seconds), ordered by name then fold.
+
+    every (classifier, fold) pair is an independent task; the matrices are placed in memmaps once and shared by all workers.
+    """
+    shared_arrays = {}
+    try:
+        for name, X in matrices.items():
+            shared_arrays[name] = share_array(numpy.ascontiguousarray(X))
+        shared_arrays['y'] = share_array(numpy.ascontiguousarray(y))
+
+        tasks = [(name, fold, num_folds) for name in sorted(matrices) for fold in range(num_folds)]
+        pool = multiprocessing.Pool(processes, attach_shared_arrays, (shared_arrays,))
+        try:
+            results = pool.map(cross_validate_fold, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        for filename, dtype, shape in shared_arrays.values():
+            os.remove(filename)
+
+    return results
+
+
+def save_main(args):
+    """
+    save_main()
+
+    @params - args: model_file [bernoulli|multinomial [corpus_file]]
+
+    train on the whole corpus and save the model for classify.py.
+    """
+    if not args:
+        print "Please specify a model file."
+        exit(1)
+
+    kind = args[1] if len(args) > 1 else nbmodel.MULTINOMIAL
+    corpus_file = args[2] if len(args) > 2 else None
+
+    bernoulli, multinomial, num_documents = stream_train(stream_documents(corpus_file))
+    classifier = bernoulli if kind == nbmodel.BERNOULLI else multinomial
+    nbmodel.save_model(args[0], nbmodel.model_from_classifier(classifier, SEARCH_WORDS))
+
+    print "saved", kind, "model trained on", num_documents, "reviews to", args[0]
+
+
+def cross_validation_main(corpus = REVIEW_CORPUS, num_folds = NUM_FOLDS, processes = None):
+    """
+    cross_validation_main()
+
+    @params - corpus: corpus directory or pack file, num_folds: number of folds, processes: worker count (default: number of CPUs)
+
+    print per-fold and average accuracies of both classifiers.
+    """
+    positive_reviews, negative_reviews = corpuspack.load_corpus(corpus)
     build_vectors(positive_reviews, negative_reviews)
 
     # use numpy to allow arrays to be indexed by other arrays
     multinomial_X_reviews = numpy.array(POSITIVE_DATA + NEGATIVE_DATA)
 
     # Binarize the feature vectors
-    binary_X_reviews = []
-    for review in multinomial_X_reviews:
-        binary_review = []
-        for feature in review:
-            if feature == 0.0:
-                binary_review.append(0.0)
-            else:
-                binary_review.append(1.0)
-        binary_X_reviews.append(binary_review)
-
-    binary_X_reviews = numpy.array(binary_X_reviews)
+    binary_X_reviews = (multinomial_X_reviews > 0).astype(numpy.float64)
 
     y_reviews = numpy.asarray([ 1 for review in POSITIVE_DATA ] + [ 0 for review in NEGATIVE_DATA ])
 
-    k_fold = KFold(n_splits=NUM_FOLDS)
+    results = parallel_cross_validate({'bernoulli': binary_X_reviews, 'multinomial': multinomial_X_reviews}, y_reviews, num_folds, processes)
+
+    for name, fold, accuracy, fit_time, score_time in results:
+        print name, "fold", fold, "accuracy:", '%.3f'%accuracy, "fit:", '%.4f'%fit_time, "s score:", '%.4f'%score_time, "s"
+    print
 
-    bernoulli_k_fold_scores = [bernoulli.fit(binary_X_reviews[train], y_reviews[train]).score(binary_X_reviews[test], y_reviews[test]) for train, test in k_fold.split(binary_X_reviews)]
-    multinomial_k_fold_scores = [multinomial.fit(multinomial_X_reviews[train], y_reviews[train]).score(multinomial_X_reviews[test], y_reviews[test]) for train, test in k_fold.split(multinomial_X_reviews)]
+    bernoulli_k_fold_scores = [ result[2] for result in results if result[0] == 'bernoulli' ]
+    multinomial_k_fold_scores = [ result[2] for result in results if result[0] == 'multinomial' ]
 
     # alternative, less manual method
     # k_fold_scores cross_val_score(svc, X_reviews, y_reviews, cv=k_fold, n_jobs=-1)
 
     print "bernoulli_k_fold_scores:", bernoulli_k_fold_scores
-    print "Bernoulli average accuracy:", '%.1f'%(sum(bernoulli_k_fold_scores)/NUM_FOLDS*100), "%"
+    print "Bernoulli average accuracy:", '%.1f'%(sum(bernoulli_k_fold_scores)/num_folds*100), "%"
 
     print "multinomial_k_fold_scores:", multinomial_k_fold_scores
-    print "Multinomial average accuracy:", '%.1f'%(sum(multinomial_k_fold_scores)/NUM_FOLDS*100), "%"
+    print "Multinomial average accuracy:", '%.1f'%(sum(multinomial_k_fold_scores)/num_folds*100), "%"
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "stream":
+        stream_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "save":
+        save_main(sys.argv[2:])
+        return
 
+    cross_validation_main(sys.argv[1] if len(sys.argv) > 1 else REVIEW_CORPUS)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,153 @@
+# nbmodel.py
+#
+# Save, load and score trained Naive Bayes review classifiers.
+#
+# A model file holds the vocabulary and the classifier reduced to a single linear
+# scoring rule, log P(class | review) = X . weights[class] + bias[class] (up to a
+# constant), so that scoring a batch of reviews is one matrix product.
+
+import sys, numpy
+from os.path import abspath, dirname, join
+
+# the shared tokenizer lives next to the corpus in ass2
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', 'ass2'))
+import tokenizer
+
+BERNOULLI = 'bernoulli'
+MULTINOMIAL = 'multinomial'
+
+
+def model_from_classifier(classifier, vocabulary):
+    """
+    model_from_classifier()
+
+    @params - classifier: trained BernoulliNB or MultinomialNB, vocabulary: list of words indexing the feature vectors
+
+    @returns - model dictionary ready to be scored or saved.
+    """
+    feature_log_prob = numpy.asarray(classifier.feature_log_prob_, dtype=numpy.float64)
+    class_log_prior = numpy.asarray(classifier.class_log_prior_, dtype=numpy.float64)
+
+    if classifier.__class__.__name__ == 'BernoulliNB':
+        # absorb the absent-word terms log(1-p) into the bias so that
+        # sum(x*log(p) + (1-x)*log(1-p)) = x . (log(p) - log(1-p)) + sum(log(1-p))
+        feature_log_neg_prob = numpy.log1p(-numpy.exp(feature_log_prob))
+        weights = feature_log_prob - feature_log_neg_prob
+        bias = class_log_prior + feature_log_neg_prob.sum(axis=1)
+        kind = BERNOULLI
+    else:
+        weights = feature_log_prob
+        bias = class_log_prior
+        kind = MULTINOMIAL
+
+    return build_model(kind, vocabulary, classifier.classes_, weights, bias)
+
+
+def model_from_probabilities(vocabulary, probability_vector_positive, probability_vector_negative):
+    """
+    model_from_probabilities()
+
+    @params - vocabulary: list of normalized words (see tokenizer.build_vocabulary), probability_vector_positive/negative: per-word probabilities as built by reviews.build_probabilities
+
+    @returns - Bernoulli model dictionary with equal class priors (classes 0 = negative, 1 = positive).
+    """
+    # keep log() finite for words that never/always appeared in training
+    probabilities = numpy.clip(numpy.array([probability_vector_negative, probability_vector_positive], dtype=numpy.float64), 1e-9, 1 - 1e-9)
+    weights = numpy.log(probabilities) - numpy.log1p(-probabilities)
+    bias = numpy.log1p(-probabilities).sum(axis=1)
+    return build_model(BERNOULLI, vocabulary, [0, 1], weights, bias)
+
+
+def build_model(kind, vocabulary, classes, weights, bias):
+    """
+    build_model()
+
+    @params - kind: BERNOULLI or MULTINOMIAL, vocabulary: list of normalized words and 'first second' bigrams, classes: class labels, weights: (classes x words) array, bias: per-class array
+
+    @returns - model dictionary.
+    """
+    vocabulary = [str(word) for word in vocabulary]
+    index = dict((word, x) for x, word in enumerate(vocabulary))
+    return {'kind': str(kind),
+            'vocabulary': vocabulary,
+            'index': index,
+            'bigrams': tokenizer.has_bigrams(index),
+            'classes': numpy.asarray(classes),
+            'weights': numpy.ascontiguousarray(weights, dtype=numpy.float64),
+            'bias': numpy.asarray(bias, dtype=numpy.float64)}
+
+
+def save_model(filename, model):
+    """
+    save_model()
+
+    @params - filename: destination file (numpy .npz, uncompressed for fast loading), model: model dictionary
+    """
+    # write through a file object so numpy does not append '.npz' to the name
+    file = open(filename, 'wb')
+    numpy.savez(file,
+                kind=numpy.array(model['kind']),
+                vocabulary=numpy.array(model['vocabulary']),
+                classes=model['classes'],
+                weights=model['weights'],
+                bias=model['bias'])
+    file.close()
+
+
+def load_model(filename):
+    """
+    load_model()
+
+    @params - filename: file written by save_model()
+
+    @returns - model dictionary.
+    """
+    archive = numpy.load(filename)
+    try:
+        return build_model(archive['kind'].item(), archive['vocabulary'].tolist(), archive['classes'], archive['weights'], archive['bias'])
+    finally:
+        archive.close()
+
+
+def vectorize(contents, model):
+    """
+    vectorize()
+
+    @params - contents: list of review texts, model: model dictionary
+
+    @returns - (reviews x words) feature matrix, binarized for Bernoulli models.
+    """
+    index = model['index']
+    ids = tokenizer.new_id_buffer()
+    X = numpy.zeros((len(contents), len(index)))
+
+    for row in range(len(contents)):
+        num_ids = tokenizer.encode(contents[row], index, ids, model['bigrams'])
+        X[row] = numpy.bincount(numpy.asarray(ids[:num_ids], dtype=numpy.intp), minlength=len(index))
+
+    if model['kind'] == BERNOULLI:
+        X = (X > 0).astype(numpy.float64)
+    return X
+
+
+def score(X, model):
+    """
+    score()
+
+    @params - X: feature matrix from vectorize(), model: model dictionary
+
+    @returns - (reviews x classes) unnormalized log posteriors.
+    """
+    return X.dot(model['weights'].T) + model['bias']
+
+
+def classify(contents, model):
+    """
+    classify()
+
+    @params - contents: list of review texts, model: model dictionary
+
+    @returns - predicted class label of each review, log-odds of the last class over the first.
+    """
+    log_posteriors = score(vectorize(contents, model), model)
+    return model['classes'][log_posteriors.argmax(axis=1)], log_posteriors[:, -1] - log_posteriors[:, 0]
@@ -0,0 +1,211 @@
+# sweep.py
+#
+# Sweep Naive Bayes hyperparameters (model type, smoothing alpha, vocabulary cutoff)
+# across k folds from a single pass over the corpus.
+#
+# Term counts are computed once per document. Every fold's training statistics
+# (per-class term totals, per-class document frequencies, per-class document counts)
+# are then the corpus totals minus the held-out fold's, so each grid point only costs
+# a few vector operations and one sparse product over the held-out reviews.
+#
+# usage: sweep.py [corpus directory or pack file]
+
+import sys, time, numpy
+from collections import Counter
+from scipy import sparse
+from sklearn.model_selection import KFold
+
+import naivebayes
+import corpuspack, tokenizer
+
+NUM_FOLDS = naivebayes.NUM_FOLDS
+ALPHAS = [0.01, 0.1, 0.5, 1.0, 2.0]
+# vocabulary cutoffs; None keeps every word seen in training
+VOCABULARY_SIZES = [10, 100, 1000, 10000, None]
+SELECTIONS = ['df', 'mi']
+MODELS = ['bernoulli', 'multinomial']
+
+
+def count_matrix(contents):
+    """
+    count_matrix()
+
+    @params - contents: list of reviews
+
+    @returns - sparse (reviews x words) matrix of term counts, list of words indexing its columns.
+    """
+    vocabulary = {}
+    add_word = vocabulary.setdefault
+    indptr = [0]
+    indices = []
+    data = []
+
+    for content in contents:
+        counts = Counter([add_word(token, len(vocabulary)) for token in tokenizer.normalize(content)])
+        indices.extend(counts.keys())
+        data.extend(counts.values())
+        indptr.append(len(indices))
+
+    X = sparse.csr_matrix((numpy.array(data, dtype=numpy.float64), numpy.array(indices, dtype=numpy.int32), numpy.array(indptr, dtype=numpy.int64)),
+                          shape=(len(contents), len(vocabulary)))
+
+    words = [None for x in range(len(vocabulary))]
+    for word, word_id in vocabulary.items():
+        words[word_id] = word
+    return X, words
+
+
+def fold_statistics(X, y, folds):
+    """
+    fold_statistics()
+
+    @params - X: sparse count matrix, y: labels (0 or 1), folds: list of (train, test) index arrays
+
+    @returns - per-fold (term totals, document frequencies, document counts) of the held-out reviews,
+    each indexed [fold][class], from one sparse product over the corpus.
+    """
+    num_folds = len(folds)
+    # one row per (fold, class): 1 where the review is held out in that fold and has that class
+    rows = numpy.zeros(X.shape[0], dtype=numpy.int64)
+    for fold in range(num_folds):
+        rows[folds[fold][1]] = fold * 2
+    rows += y
+    membership = sparse.csr_matrix((numpy.ones(X.shape[0]), (rows, numpy.arange(X.shape[0]))), shape=(num_folds * 2, X.shape[0]))
+
+    binary_X = X.copy()
+    binary_X.data[:] = 1
+
+    term_totals = numpy.asarray((membership * X).todense()).reshape(num_folds, 2, X.shape[1])
+    document_frequencies = numpy.asarray((membership * binary_X).todense()).reshape(num_folds, 2, X.shape[1])
+    document_counts = numpy.asarray(membership.sum(axis=1)).reshape(num_folds, 2)
+    return term_totals, document_frequencies, document_counts
+
+
+def mutual_information(document_frequencies, document_counts):
+    """
+    mutual_information()
+
+    @params - document_frequencies: (classes x words) documents containing each word, document_counts: documents per class
+
+    @returns - mutual information between each word's presence and the class.
+    """
+    num_documents = document_counts.sum()
+    class_probability = document_counts / num_documents
+    word_probability = document_frequencies.sum(axis=0) / num_documents
+    information = numpy.zeros(document_frequencies.shape[1])
+
+    for joint_counts, marginal in ((document_frequencies, word_probability), (document_counts[:, None] - document_frequencies, 1 - word_probability)):
+        joint = joint_counts / num_documents
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            terms = joint * numpy.log(joint / (marginal[None, :] * class_probability[:, None]))
+        information += numpy.nan_to_num(terms).sum(axis=0)
+    return information
+
+
+def log_probabilities(model, alpha, term_totals, document_frequencies, document_counts, columns):
+    """
+    log_probabilities()
+
+    @params - model: 'bernoulli' or 'multinomial', alpha: smoothing, term_totals/document_frequencies: (classes x words) training statistics,
+    document_counts: training documents per class, columns: selected vocabulary
+
+    @returns - (weights, bias) such that log P(class | review) = X[:, columns] . weights.T + bias, as fit by scikit-learn.
+    """
+    class_log_prior = numpy.log(document_counts / document_counts.sum())
+
+    if model == 'multinomial':
+        counts = term_totals[:, columns] + alpha
+        weights = numpy.log(counts) - numpy.log(counts.sum(axis=1))[:, None]
+        return weights, class_log_prior
+
+    probability = (document_frequencies[:, columns] + alpha) / (document_counts[:, None] + 2 * alpha)
+    log_absent = numpy.log1p(-probability)
+    return numpy.log(probability) - log_absent, class_log_prior + log_absent.sum(axis=1)
+
+
+def sweep(X, y, words, num_folds = NUM_FOLDS, alphas = ALPHAS, vocabulary_sizes = VOCABULARY_SIZES, selections = SELECTIONS, models = MODELS):
+    """
+    sweep()
+
+    @params - X: sparse count matrix, y: labels, words: column words, num_folds: number of folds,
+    alphas/vocabulary_sizes/selections/models: grid to evaluate
+
+    @returns - list of (mean accuracy, standard deviation, model, selection, vocabulary size, alpha), best first.
+
+    selections rank words by training document frequency ('df') or mutual information ('mi');
+    'search words' (naivebayes.SEARCH_WORDS) is always evaluated as well.
+    """
+    # shuffle so that no held-out fold is made of a single class
+    folds = list(KFold(n_splits=num_folds, shuffle=True, random_state=0).split(X))
+    held_out_totals, held_out_frequencies, held_out_counts = fold_statistics(X, y, folds)
+    binary_X = X.copy()
+    binary_X.data[:] = 1
+
+    word_index = dict((word, x) for x, word in enumerate(words))
+    search_columns = numpy.array([word_index[word] for word in naivebayes.SEARCH_WORDS if word in word_index], dtype=numpy.int64)
+
+    candidates = [('search words', len(search_columns))] + [(selection, size) for selection in selections for size in vocabulary_sizes]
+    accuracies = {}
+
+    for fold in range(num_folds):
+        test = folds[fold][1]
+        term_totals = held_out_totals.sum(axis=0) - held_out_totals[fold]
+        document_frequencies = held_out_frequencies.sum(axis=0) - held_out_frequencies[fold]
+        document_counts = held_out_counts.sum(axis=0) - held_out_counts[fold]
+
+        # only words seen in training can be selected
+        seen = numpy.flatnonzero(document_frequencies.sum(axis=0))
+        rankings = {'search words': search_columns,
+                    'df': seen[numpy.argsort(-document_frequencies[:, seen].sum(axis=0), kind='mergesort')],
+                    'mi': seen[numpy.argsort(-mutual_information(document_frequencies[:, seen], document_counts), kind='mergesort')]}
+
+        test_matrices = {'multinomial': X[test], 'bernoulli': binary_X[test]}
+
+        for selection, size in candidates:
+            columns = rankings[selection][:size]
+            for model in models:
+                X_test = test_matrices[model][:, columns]
+                for alpha in alphas:
+                    weights, bias = log_probabilities(model, alpha, term_totals, document_frequencies, document_counts, columns)
+                    predictions = numpy.asarray(X_test * weights.T + bias).argmax(axis=1)
+                    accuracies.setdefault((model, selection, size, alpha), []).append((predictions == y[test]).mean())
+
+    results = [(numpy.mean(scores), numpy.std(scores), model, selection, size, alpha) for (model, selection, size, alpha), scores in accuracies.items()]
+    results.sort(key=lambda result: -result[0])
+    return results
+
+
+def main():
+    corpus = sys.argv[1] if len(sys.argv) > 1 else naivebayes.REVIEW_CORPUS
+    positive_reviews, negative_reviews = corpuspack.load_corpus(corpus)
+
+    start_time = time.time()
+    contents = []
+    labels = []
+    for label, documents in ((1, positive_reviews), (0, negative_reviews)):
+        for document in documents:
+            content = corpuspack.document_content(document)
+            # skip directories
+            if content is None:
+                continue
+            contents.append(content)
+            labels.append(label)
+
+    X, words = count_matrix(contents)
+    y = numpy.array(labels)
+    count_time = time.time() - start_time
+
+    start_time = time.time()
+    results = sweep(X, y, words)
+    sweep_time = time.time() - start_time
+
+    print "reviews:", X.shape[0], "words:", X.shape[1], "counted in", '%.2f'%count_time, "s"
+    print "grid of", len(results), "configurations x", NUM_FOLDS, "folds evaluated in", '%.2f'%sweep_time, "s"
+    print
+    print '%-5s %-12s %-13s %-6s %-6s %-9s %s' % ('rank', 'model', 'selection', 'words', 'alpha', 'accuracy', 'std')
+    for rank in range(len(results)):
+        accuracy, deviation, model, selection, size, alpha = results[rank]
+        print '%-5d %-12s %-13s %-6s %-6s %-9s %.3f' % (rank + 1, model, selection, 'all' if size is None else size, alpha, '%.1f %%'%(accuracy*100), deviation)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# importtime.py
+#
+# Measure the startup cost of every entry point: each module is imported in a fresh
+# interpreter, several times, and the fastest wall-clock import time is kept. When the
+# interpreter supports '-X importtime' (Python 3.7+) the slowest imports it reports are
+# recorded as well.
+#
+# usage: importtime.py [--python INTERPRETER] [--repeat N] [--top N] [--output FILE]
+
+import sys, json, time, platform, argparse, subprocess
+from os.path import abspath, dirname, join
+
+ROOT = join(dirname(abspath(__file__)), '..')
+
+# (module, directory holding it)
+ENTRY_POINTS = [('csc421', '.'),
+                ('cities_ai', 'ass1'),
+                ('monopoly', 'ass2'),
+                ('reviews', 'ass2'),
+                ('corpuspack', 'ass2'),
+                ('tokenizer', 'ass2'),
+                ('csp', 'ass3'),
+                ('discretebayesian', 'ass3'),
+                ('naivebayes', 'ass3'),
+                ('nbmodel', 'ass3'),
+                ('classify', 'ass3'),
+                ('sweep', 'ass3')]
+
+REPEAT = 5
+TOP_IMPORTS = 10
+RESULTS_FILE = 'importtime_results.json'
+
+# run in the child: import the module and print the seconds spent importing it
+IMPORT_SCRIPT = "import sys, time; sys.path.insert(0, sys.argv[1]); start_time = time.time(); __import__(sys.argv[2]); sys.stdout.write('%r' % (time.time() - start_time))"
+
+
+def supports_importtime(python):
+    """
+    supports_importtime()
+
+    @params - python: interpreter to test
+
+    @returns - True if the interpreter reports import times with '-X importtime'.
+    """
+    process = subprocess.Popen([python, '-X', 'importtime', '-c', 'pass'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, errors = process.communicate()
+    return process.returncode == 0 and b'import time:' in errors
+
+
+def time_import(python, module, directory):
+    """
+    time_import()
+
+    @params - python: interpreter, module: module name, directory: directory holding the module
+
+    @returns - seconds spent importing the module, seconds for the whole interpreter run, or (None, None) if the import failed.
+    """
+    start_time = time.time()
+    process = subprocess.Popen([python, '-c', IMPORT_SCRIPT, join(ROOT, directory), module], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, errors = process.communicate()
+    total_time = time.time() - start_time
+    if process.returncode != 0:
+        return None, None
+    return float(output), total_time
+
+
+def slowest_imports(python, module, directory, top = TOP_IMPORTS):
+    """
+    slowest_imports()
+
+    @params - python: interpreter supporting '-X importtime', module: module name, directory: directory holding the module, top: number of imports kept
+
+    @returns - list of {'module', 'self_us', 'cumulative_us'} for the imports with the largest cumulative time.
+    """
+    process = subprocess.Popen([python, '-X', 'importtime', '-c', IMPORT_SCRIPT, join(ROOT, directory), module],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, errors = process.communicate()
+
+    imports = []
+    for line in errors.decode('utf-8', 'replace').splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        imports.append({'module': fields[2].strip(), 'self_us': int(fields[0]), 'cumulative_us': int(fields[1])})
+
+    imports.sort(key=lambda entry: entry['cumulative_us'], reverse=True)
+    return imports[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import time of every entry point.')
+    parser.add_argument('--python', default=sys.executable, help='interpreter to measure (default: this one)')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='fresh interpreters per entry point')
+    parser.add_argument('--top', type=int, default=TOP_IMPORTS, help='slowest imports recorded per entry point with -X importtime')
+    parser.add_argument('--output', default=RESULTS_FILE, help='JSON results file')
+    args = parser.parse_args()
+
+    importtime = supports_importtime(args.python)
+    results = []
+
+    for module, directory in ENTRY_POINTS:
+        timings = [time_import(args.python, module, directory) for x in range(args.repeat)]
+        result = {'module': module, 'directory': directory}
+        if any(None in timing for timing in timings):
+            result['error'] = 'import failed'
+            print '%-18s import failed' % module
+        else:
+            result['import_seconds'] = min(timing[0] for timing in timings)
+            result['interpreter_seconds'] = min(timing[1] for timing in timings)
+            if importtime:
+                result['slowest_imports'] = slowest_imports(args.python, module, directory, args.top)
+            print '%-18s %8.1f ms import %8.1f ms interpreter' % (module, 1000 * result['import_seconds'], 1000 * result['interpreter_seconds'])
+        results.append(result)
+
+    output = open(args.output, 'w')
+    json.dump({'timestamp': time.time(),
+               'python': args.python,
+               'platform': platform.platform(),
+               'importtime': importtime,
+               'repeat': args.repeat,
+               'results': results}, output, indent=2, sort_keys=True)
+    output.close()
+    print "results written to", args.output
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+# pipeline.py
+#
+# Benchmark each stage of the review classification pipeline on synthetic corpora
+# (10^3 to 10^6 reviews) and write machine-readable results for tracking regressions.
+#
+# Every stage runs in a fresh process so that its peak RSS is measured on its own.
+#
+# usage: pipeline.py [--sizes N [N ...]] [--format pack|dir] [--output FILE]
+#                    [--workdir DIR] [--length L] [--positive-fraction P] [--seed S]
+
+import os, sys, json, time, shutil, platform, resource, tempfile, argparse, traceback, multiprocessing
+from Queue import Empty
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', 'ass2'))
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', 'ass3'))
+import synthetic, corpuspack
+
+SIZES = [1000, 10000, 100000]
+# seconds between checks that a stage process is still running
+POLL_INTERVAL = 1.0
+RESULTS_FILE = 'pipeline_results.json'
+
+
+def peak_rss_kb():
+    """
+    peak_rss_kb()
+
+    @params - None
+
+    @returns - peak resident set size of this process in kilobytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return peak
+
+
+def stage_ingest(corpus):
+    """
+    stage_ingest()
+
+    @params - corpus: corpus directory or pack file
+
+    @returns - number of reviews read, seconds taken to list and read them all.
+    """
+    start_time = time.time()
+    positive_reviews, negative_reviews = corpuspack.load_corpus(corpus)
+    num_reviews = 0
+    for document in positive_reviews + negative_reviews:
+        if corpuspack.document_content(document) is not None:
+            num_reviews += 1
+    return num_reviews, time.time() - start_time
+
+
+def stage_reviews_train(corpus):
+    """
+    stage_reviews_train()
+
+    @params - corpus: corpus directory or pack file
+
+    @returns - number of reviews, seconds spent in reviews.build_probabilities().
+    """
+    import reviews
+    positive_reviews, negative_reviews = corpuspack.load_corpus(corpus)
+    reviews.num_pos_files = reviews.num_neg_files = 0
+    probability_vector_positive = [0.0 for x in range(len(reviews.SEARCH_WORDS))]
+    probability_vector_negative = [0.0 for x in range(len(reviews.SEARCH_WORDS))]
+
+    start_time = time.time()
+    reviews.build_probabilities(positive_reviews, negative_reviews, probability_vector_positive, probability_vector_negative)
+    return len(positive_reviews) + len(negative_reviews), time.time() - start_time
+
+
+def stage_reviews_score(corpus):
+    """
+    stage_reviews_score()
+
+    @params - corpus: corpus directory or pack file
+
+    @returns - number of reviews, seconds spent in reviews.validate().
+    """
+    import reviews
+    positive_reviews, negative_reviews = corpuspack.load_corpus(corpus)
+    reviews.num_pos_files = reviews.num_neg_files = 0
+    probability_vector_positive = [0.0 for x in range(len(reviews.SEARCH_WORDS))]
+    probability_vector_negative = [0.0 for x in range(len(reviews.SEARCH_WORDS))]
+    reviews.build_probabilities(positive_reviews, negative_reviews, probability_vector_positive, probability_vector_negative)
+
+    start_time = time.time()
+    reviews.validate(positive_reviews, negative_reviews, probability_vector_positive, probability_vector_negative)
+    return len(positive_reviews) + len(negative_reviews), time.time() - start_time
+
+
+def naivebayes_vectors(corpus):
+    """
+    naivebayes_vectors()
+
+    @params - corpus: corpus directory or pack file
+
+    @returns - naivebayes module, count feature matrix, labels, seconds spent in naivebayes.build_vectors().
+    """
+    import numpy, naivebayes
+    positive_reviews, negative_reviews = corpuspack.load_corpus(corpus)
+    del naivebayes.POSITIVE_DATA[:]
+    del naivebayes.NEGATIVE_DATA[:]
+
+    start_time = time.time()
+    naivebayes.build_vectors(positive_reviews, negative_reviews)
+    seconds = time.time() - start_time
+
+    X = numpy.array(naivebayes.POSITIVE_DATA + naivebayes.NEGATIVE_DATA)
+    y = numpy.array([1 for review in naivebayes.POSITIVE_DATA] + [0 for review in naivebayes.NEGATIVE_DATA])
+    return naivebayes, X, y, seconds
+
+
+def stage_naivebayes_vectors(corpus):
+    """
+    stage_naivebayes_vectors()
+
+    @params - corpus: corpus directory or pack file
+
+    @returns - number of reviews, seconds spent in naivebayes.build_vectors().
+    """
+    naivebayes, X, y, seconds = naivebayes_vectors(corpus)
+    return len(y), seconds
+
+
+def stage_naivebayes_train(corpus):
+    """
+    stage_naivebayes_train()
+
+    @params - corpus: corpus directory or pack file
+
+    @returns - number of reviews, seconds spent fitting both classifiers.
+    """
+    naivebayes, X, y, seconds = naivebayes_vectors(corpus)
+    # naivebayes imports sklearn lazily; keep the import out of the fit timing
+    import sklearn.naive_bayes
+
+    start_time = time.time()
+    for name in sorted(naivebayes.CLASSIFIERS):
+        naivebayes.new_classifier(name).fit(X, y)
+    return len(y), time.time() - start_time
+
+
+def stage_naivebayes_score(corpus):
+    """
+    stage_naivebayes_score()
+
+    @params - corpus: corpus directory or pack file
+
+    @returns - number of reviews, seconds spent scoring with both classifiers.
+    """
+    naivebayes, X, y, seconds = naivebayes_vectors(corpus)
+    classifiers = [naivebayes.new_classifier(name).fit(X, y) for name in sorted(naivebayes.CLASSIFIERS)]
+
+    start_time = time.time()
+    for classifier in classifiers:
+        classifier.predict(X)
+    return len(y), time.time() - start_time
+
+
+STAGES = [('ingest', stage_ingest),
+          ('reviews.build_probabilities', stage_reviews_train),
+          ('reviews.validate', stage_reviews_score),
+          ('naivebayes.build_vectors', stage_naivebayes_vectors),
+          ('naivebayes.fit', stage_naivebayes_train),
+          ('naivebayes.predict', stage_naivebayes_score)]
+
+
+def run_stage(stage, corpus, queue):
+    """
+    run_stage()
+
+    @params - stage: index into STAGES, corpus: corpus directory or pack file, queue: receives the result
+
+    child process body: run one stage and report its timing and memory, or the error it raised.
+    """
+    name, function = STAGES[stage]
+    baseline_rss = peak_rss_kb()
+    try:
+        num_reviews, seconds = function(corpus)
+    except Exception:
+        queue.put({'stage': name, 'error': traceback.format_exc()})
+        return
+    queue.put({'stage': name,
+               'reviews': num_reviews,
+               'seconds': seconds,
+               'reviews_per_second': num_reviews / max(seconds, 1e-9),
+               'baseline_rss_kb': baseline_rss,
+               'peak_rss_kb': peak_rss_kb()})
+
+
+def stage_result(stage, process, queue):
+    """
+    stage_result()
+
+    @params - stage: index into STAGES, process: child process running the stage, queue: receives its result
+
+    @returns - the stage result, or {'stage', 'error'} if the child died without reporting one.
+    """
+    while True:
+        try:
+            return queue.get(timeout=POLL_INTERVAL)
+        except Empty:
+            if not process.is_alive():
+                # the child may have reported just before exiting
+                try:
+                    return queue.get(timeout=POLL_INTERVAL)
+                except Empty:
+                    return {'stage': STAGES[stage][0], 'error': 'stage process exited with code %s' % process.exitcode}
+
+
+def benchmark_corpus(corpus):
+    """
+    benchmark_corpus()
+
+    @params - corpus: corpus directory or pack file
+
+    @returns - list of stage results, each measured in its own process; failed stages carry an 'error' instead of timings.
+    """
+    results = []
+    for stage in range(len(STAGES)):
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=run_stage, args=(stage, corpus, queue))
+        process.start()
+        results.append(stage_result(stage, process, queue))
+        process.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the review classification pipeline on synthetic corpora.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='corpus sizes in reviews')
+    parser.add_argument('--format', choices=['pack', 'dir'], default='pack')
+    parser.add_argument('--output', default=RESULTS_FILE, help='JSON results file')
+    parser.add_argument('--workdir', default=None, help='directory for generated corpora (default: a temporary directory, removed afterwards)')
+    parser.add_argument('--length', type=int, default=synthetic.MEAN_LENGTH, help='mean words per review')
+    parser.add_argument('--positive-fraction', type=float, default=synthetic.POSITIVE_FRACTION)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='pipeline_')
+    results = []
+
+    try:
+        for size in args.sizes:
+            corpus = join(workdir, 'synthetic_%d%s' % (size, '.pack' if args.format == 'pack' else ''))
+            if not os.path.exists(corpus):
+                start_time = time.time()
+                synthetic.generate_corpus(corpus, args.format, num_reviews=size, mean_length=args.length,
+                                          positive_fraction=args.positive_fraction, seed=args.seed)
+                print "generated", size, "reviews in", '%.1f'%(time.time() - start_time), "s"
+
+            for result in benchmark_corpus(corpus):
+                result['size'] = size
+                results.append(result)
+                if 'error' in result:
+                    print '%-9d %-28s failed: %s' % (size, result['stage'], result['error'].strip().splitlines()[-1])
+                else:
+                    print '%-9d %-28s %10.3f s %12.0f reviews/s %10d KB peak RSS' % (size, result['stage'], result['seconds'], result['reviews_per_second'], result['peak_rss_kb'])
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir)
+
+    output = open(args.output, 'w')
+    json.dump({'timestamp': time.time(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'parameters': {'format': args.format, 'length': args.length, 'positive_fraction': args.positive_fraction, 'seed': args.seed},
+               'results': results}, output, indent=2, sort_keys=True)
+    output.close()
+    print "results written to", args.output
+
+if __name__ == '__main__':
+    main()
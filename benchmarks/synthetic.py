@@ -0,0 +1,122 @@
+# synthetic.py
+#
+# Generate synthetic review corpora of any size for benchmarking the text
+# classification pipeline.
+#
+# Filler words are drawn from a Zipfian vocabulary; the SEARCH_WORDS used by the
+# classifiers are sprinkled in at class-dependent rates so the corpus stays learnable.
+#
+# usage: synthetic.py <output> [--reviews N] [--format pack|dir] [--length L]
+#                              [--vocabulary V] [--zipf Z] [--positive-fraction P] [--seed S]
+
+import os, sys, argparse, numpy
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', 'ass2'))
+import corpuspack
+
+NUM_REVIEWS = 1000
+MEAN_LENGTH = 700
+VOCABULARY_SIZE = 50000
+ZIPF_EXPONENT = 1.1
+POSITIVE_FRACTION = 0.5
+
+# expected occurrences per MEAN_LENGTH words of each sentiment word, as (in negative reviews, in positive reviews)
+SENTIMENT_RATES = {'awful': (0.15, 0.03),
+                   'bad': (0.9, 0.4),
+                   'boring': (0.25, 0.06),
+                   'dull': (0.12, 0.03),
+                   'effective': (0.06, 0.15),
+                   'enjoyable': (0.06, 0.12),
+                   'great': (0.4, 0.7),
+                   'hilarious': (0.06, 0.16)}
+
+
+def generate_reviews(num_reviews = NUM_REVIEWS, mean_length = MEAN_LENGTH, vocabulary_size = VOCABULARY_SIZE,
+                     positive_fraction = POSITIVE_FRACTION, zipf_exponent = ZIPF_EXPONENT, seed = 0):
+    """
+    generate_reviews()
+
+    @params - num_reviews: number of reviews, mean_length: mean words per review (Poisson distributed),
+    vocabulary_size: number of filler words, positive_fraction: share of positive reviews (class skew),
+    zipf_exponent: exponent of the filler word frequency law, seed: random seed
+
+    @returns - generator of (label, content) pairs, one review at a time.
+    """
+    random_state = numpy.random.RandomState(seed)
+    # wide enough for the sentiment words written over filler words
+    words = numpy.array(['w%x' % x for x in range(vocabulary_size)], dtype='S16')
+    cumulative = numpy.cumsum(1.0 / numpy.arange(1, vocabulary_size + 1) ** zipf_exponent)
+    cumulative /= cumulative[-1]
+
+    sentiment_words = sorted(SENTIMENT_RATES)
+    sentiment_rates = numpy.array([SENTIMENT_RATES[word] for word in sentiment_words]).T / float(mean_length)
+
+    for review in range(num_reviews):
+        label = int(random_state.rand() < positive_fraction)
+        length = max(1, random_state.poisson(mean_length))
+        tokens = words[numpy.searchsorted(cumulative, random_state.rand(length))]
+
+        # overwrite random positions with sentiment words
+        occurrences = random_state.poisson(sentiment_rates[label] * length)
+        positions = random_state.randint(0, length, occurrences.sum())
+        tokens[positions] = numpy.repeat(sentiment_words, occurrences)
+
+        yield label, ' '.join(tokens.tolist()) + '\n'
+
+
+def write_directory(documents, directory):
+    """
+    write_directory()
+
+    @params - documents: iterable of (label, content), directory: corpus directory to create ('pos' and 'neg' subdirectories)
+
+    @returns - number of reviews written.
+    """
+    class_names = dict((label, class_name) for class_name, label in corpuspack.LABELS.items())
+    for class_name in class_names.values():
+        if not os.path.isdir(join(directory, class_name)):
+            os.makedirs(join(directory, class_name))
+
+    num_reviews = 0
+    for label, content in documents:
+        file = open(join(directory, class_names[label], 'cv%07d.txt' % num_reviews), 'wb')
+        file.write(content)
+        file.close()
+        num_reviews += 1
+    return num_reviews
+
+
+def generate_corpus(output, corpus_format = 'pack', **options):
+    """
+    generate_corpus()
+
+    @params - output: pack file or corpus directory, corpus_format: 'pack' or 'dir', options: passed to generate_reviews()
+
+    @returns - number of reviews written.
+    """
+    documents = generate_reviews(**options)
+    if corpus_format == 'dir':
+        return write_directory(documents, output)
+    return corpuspack.write_pack(documents, output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic review corpus.')
+    parser.add_argument('output', help='pack file or corpus directory to write')
+    parser.add_argument('--reviews', type=int, default=NUM_REVIEWS)
+    parser.add_argument('--format', choices=['pack', 'dir'], default='pack')
+    parser.add_argument('--length', type=int, default=MEAN_LENGTH, help='mean words per review')
+    parser.add_argument('--vocabulary', type=int, default=VOCABULARY_SIZE, help='number of filler words')
+    parser.add_argument('--zipf', type=float, default=ZIPF_EXPONENT, help='Zipf exponent of filler words')
+    parser.add_argument('--positive-fraction', type=float, default=POSITIVE_FRACTION)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    num_reviews = generate_corpus(args.output, args.format, num_reviews=args.reviews, mean_length=args.length,
+                                  vocabulary_size=args.vocabulary, positive_fraction=args.positive_fraction,
+                                  zipf_exponent=args.zipf, seed=args.seed)
+    print "wrote", num_reviews, "reviews to", args.output
+
+if __name__ == '__main__':
+    main()
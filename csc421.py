@@ -0,0 +1,270 @@
+# csc421.py
+#
+# Single command line entry point for the assignment programs, with optional
+# profiling of any run.
+#
+# usage: csc421.py [--profile] [--profile-limit N] [--timings] [--seed S] <command> [options]
+#
+#   search     {1,many} [--size N] [--problems N]             uninformed and informed search (ass1)
+#   monopoly   [--simulations N] [--turns N] [--players N] [--checkpoint FILE]
+#                                                             board space probabilities (ass2)
+#   reviews    [--corpus PATH] [--folds N]                    hand-written Bernoulli classifier (ass2)
+#   naivebayes [--corpus PATH] [--folds N] [--processes N]    sklearn naive Bayes cross-validation (ass3)
+#
+# --profile prints the hottest functions (cProfile) and the largest allocations
+# (tracemalloc, or under Python 2 the growth of live objects by type and of peak RSS); --timings prints
+# wall-clock time, CPU time and peak RSS. Only the main process is profiled: work
+# done in multiprocessing workers shows up as time spent waiting on the pool.
+
+import sys, time, random, resource, argparse
+from os.path import abspath, dirname, join
+
+for assignment in ['ass1', 'ass2', 'ass3']:
+    sys.path.insert(0, join(dirname(abspath(__file__)), assignment))
+
+PROFILE_LIMIT = 20
+
+
+class UsageError(Exception):
+    """
+    raised by a runner for an argument its module rejects; reported like an argparse error.
+    """
+
+
+def peak_rss_kb():
+    """
+    peak_rss_kb()
+
+    @params - None
+
+    @returns - peak resident set size of this process in kilobytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return peak
+
+
+def cpu_seconds():
+    """
+    cpu_seconds()
+
+    @params - None
+
+    @returns - user plus system CPU seconds used by this process.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def default(value, module_default):
+    """
+    default()
+
+    @params - value: parsed argument (None when not given), module_default: the module's own default
+
+    @returns - value, or module_default if the argument was not given.
+    """
+    return module_default if value is None else value
+
+
+# each runner imports its module only once the command is known, so the defaults
+# below come from the module itself and parsing the command line stays cheap
+def run_search(args):
+    import cities_ai
+    try:
+        cities_ai.configure_world(default(args.size, cities_ai.WORLD_SIZE))
+    except ValueError as error:
+        raise UsageError('argument --size: ' + str(error))
+    cities_ai.setup()
+    if args.mode == '1':
+        cities_ai.single_search_main()
+    else:
+        cities_ai.many_search_main(default(args.problems, cities_ai.NUM_PROBLEMS))
+
+
+def run_monopoly(args):
+    import monopoly
+    probabilities = monopoly.simulate(default(args.simulations, monopoly.NUM_SIMULATIONS), default(args.turns, monopoly.NUM_TURNS),
+                                      default(args.players, monopoly.NUM_PLAYERS), args.checkpoint, args.seed)
+    for x in range(monopoly.BOARD_SIZE):
+        print 'Space', x, 'probability:', '%.5f'%probabilities[x]
+
+
+def run_reviews(args):
+    import reviews
+    reviews.validation_main(default(args.corpus, reviews.REVIEW_CORPUS), default(args.folds, reviews.NUM_FOLDS))
+
+
+def run_naivebayes(args):
+    import naivebayes
+    naivebayes.cross_validation_main(default(args.corpus, naivebayes.REVIEW_CORPUS), default(args.folds, naivebayes.NUM_FOLDS), args.processes)
+
+
+def build_parser():
+    """
+    build_parser()
+
+    @params - None
+
+    @returns - argument parser with one subcommand per program; each subcommand sets 'run' to its runner.
+    """
+    parser = argparse.ArgumentParser(description='Run the CSC421 assignment programs.')
+    parser.add_argument('--profile', action='store_true', help='print the hottest functions and the largest allocations')
+    parser.add_argument('--profile-limit', type=int, default=PROFILE_LIMIT, help='rows printed by --profile')
+    parser.add_argument('--timings', action='store_true', help='print wall-clock time, CPU time and peak RSS')
+    parser.add_argument('--seed', type=int, default=None, help='seed for random and numpy.random')
+    commands = parser.add_subparsers(title='commands')
+
+    search = commands.add_parser('search', help='uninformed and informed search between cities')
+    search.add_argument('mode', choices=['1', 'many'], help="'1' solves one problem, 'many' averages over --problems problems")
+    search.add_argument('--size', type=int, help='number of cities (default: cities_ai.WORLD_SIZE, 26)')
+    search.add_argument('--problems', type=int, help='problems in many mode (default: cities_ai.NUM_PROBLEMS, 100)')
+    search.set_defaults(run=run_search)
+
+    simulation = commands.add_parser('monopoly', help='probability of landing on each monopoly space')
+    simulation.add_argument('--simulations', type=int, help='number of games (default: monopoly.NUM_SIMULATIONS, 1000)')
+    simulation.add_argument('--turns', type=int, help='turns per game (default: monopoly.NUM_TURNS, 100)')
+    simulation.add_argument('--players', type=int, help='players per game (default: monopoly.NUM_PLAYERS, 1)')
+    simulation.add_argument('--checkpoint', default=None, help='checkpoint file; an existing one is resumed (keeping its games and players) for --turns more turns')
+    simulation.set_defaults(run=run_monopoly)
+
+    classification = commands.add_parser('reviews', help='word probabilities and validation of the Bernoulli review classifier')
+    classification.add_argument('--corpus', help='corpus directory or pack file (default: ass2/review_polarity/txt_sentoken)')
+    classification.add_argument('--folds', type=int, help='folds for k-fold validation (default: reviews.NUM_FOLDS, 10)')
+    classification.set_defaults(run=run_reviews)
+
+    validation = commands.add_parser('naivebayes', help='cross-validation of the sklearn naive Bayes classifiers')
+    validation.add_argument('--corpus', help='corpus directory or pack file (default: ass2/review_polarity/txt_sentoken)')
+    validation.add_argument('--folds', type=int, help='cross-validation folds (default: naivebayes.NUM_FOLDS, 10)')
+    validation.add_argument('--processes', type=int, default=None, help='worker processes (default: number of CPUs)')
+    validation.set_defaults(run=run_naivebayes)
+
+    return parser
+
+
+def print_allocations(snapshot, limit):
+    """
+    print_allocations()
+
+    @params - snapshot: tracemalloc snapshot, limit: number of lines printed
+
+    print the source lines holding the most memory.
+    """
+    statistics = snapshot.statistics('lineno')
+    print "\n*** LARGEST ALLOCATIONS (tracemalloc) ***"
+    for statistic in statistics[:limit]:
+        print statistic
+    print "total traced:", sum(statistic.size for statistic in statistics) / 1024, "KB"
+
+
+def heap_by_type():
+    """
+    heap_by_type()
+
+    @params - None
+
+    @returns - dictionary of type name -> [live objects, bytes], over the objects the garbage collector tracks and the
+    objects they reference directly (strings, numbers and numpy arrays are not tracked themselves).
+    """
+    import gc
+    gc.collect()
+    tracked = gc.get_objects()
+    seen = set()
+    heap = {}
+    for instance in tracked + gc.get_referents(*tracked):
+        if id(instance) in seen:
+            continue
+        seen.add(id(instance))
+        entry = heap.setdefault(type(instance).__name__, [0, 0])
+        entry[0] += 1
+        entry[1] += sys.getsizeof(instance, 0)
+    return heap
+
+
+def print_heap_growth(before, after, limit):
+    """
+    print_heap_growth()
+
+    @params - before/after: from heap_by_type(), limit: number of lines printed
+
+    print the types whose live objects grew the most, in bytes.
+    """
+    growth = [(after[name][1] - before.get(name, [0, 0])[1], after[name][0] - before.get(name, [0, 0])[0], name) for name in after]
+    growth.sort(reverse=True)
+    print "\n*** LARGEST ALLOCATIONS (live objects by type) ***"
+    for size, count, name in growth[:limit]:
+        if size <= 0:
+            break
+        print '%-30s %+10d objects %+12d KB' % (name, count, size / 1024)
+    print "total growth:", sum(size for size, count, name in growth) / 1024, "KB"
+
+
+def profile(run, args):
+    """
+    profile()
+
+    @params - run: command runner, args: parsed arguments
+
+    run the command under cProfile (and tracemalloc when available) and print the summaries.
+    """
+    import cProfile, pstats
+    try:
+        import tracemalloc
+    except ImportError:
+        tracemalloc = None
+
+    if tracemalloc:
+        tracemalloc.start()
+    else:
+        heap = heap_by_type()
+        start_rss = peak_rss_kb()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        run(args)
+    finally:
+        profiler.disable()
+
+        print "\n*** HOTTEST FUNCTIONS (cProfile) ***"
+        statistics = pstats.Stats(profiler, stream=sys.stdout)
+        statistics.sort_stats('cumulative').print_stats(args.profile_limit)
+        statistics.sort_stats('tottime').print_stats(args.profile_limit)
+
+        if tracemalloc:
+            print_allocations(tracemalloc.take_snapshot(), args.profile_limit)
+            tracemalloc.stop()
+        else:
+            print_heap_growth(heap, heap_by_type(), args.profile_limit)
+            print "peak RSS:", start_rss, "->", peak_rss_kb(), "KB"
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        import numpy
+        random.seed(args.seed)
+        numpy.random.seed(args.seed)
+
+    start_time = time.time()
+    start_cpu = cpu_seconds()
+
+    try:
+        if args.profile:
+            profile(args.run, args)
+        else:
+            args.run(args)
+    except UsageError as error:
+        parser.error(str(error))
+
+    if args.timings:
+        print "\n*** TIMINGS ***"
+        print "wall-clock time:", '%.3f'%(time.time() - start_time), "s"
+        print "CPU time:", '%.3f'%(cpu_seconds() - start_cpu), "s"
+        print "peak RSS:", peak_rss_kb(), "KB"
+
+if __name__ == '__main__':
+    main()